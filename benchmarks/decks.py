@@ -0,0 +1,64 @@
+# Copyright (c) 2017, Samantha Marshall (http://pewpewthespells.com)
+# All rights reserved.
+#
+# https://github.com/samdmarshall/sli
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation and/or
+# other materials provided with the distribution.
+#
+# 3. Neither the name of Samantha Marshall nor the names of its contributors may
+# be used to endorse or promote products derived from this software without
+# specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
+# OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import random
+
+WORDS = ('slide', 'deck', 'terminal', 'render', 'socket', 'notes', 'presenter', 'markdown',
+         'latency', 'cache', 'index', 'frame', 'buffer', 'python', 'urwid', 'screen')
+
+def sentence(rng, word_count):
+    words = [rng.choice(WORDS) for _ in range(word_count)]
+    if rng.random() < 0.3:
+        words[rng.randrange(word_count)] = '**' + rng.choice(WORDS) + '**'
+    if rng.random() < 0.3:
+        words[rng.randrange(word_count)] = '`' + rng.choice(WORDS) + '`'
+    return ' '.join(words)
+
+def generate_slide(rng, index, max_lines, notes_density):
+    lines = ['# %s %d' % (sentence(rng, 2), index), '']
+    for _ in range(rng.randint(1, max_lines)):
+        kind = rng.random()
+        if kind < 0.4:
+            lines.append('- ' + sentence(rng, rng.randint(2, 8)))
+        elif kind < 0.5:
+            lines.extend(['```python', 'def %s():' % rng.choice(WORDS), '    return 0', '```'])
+        else:
+            lines.append(sentence(rng, rng.randint(4, 16)))
+        if rng.random() < notes_density:
+            lines.append('% ' + sentence(rng, rng.randint(4, 12)))
+    return '\n'.join(lines)
+
+def generate_deck(file_path, slide_count, max_lines=12, notes_density=0.3, seed=0):
+    rng = random.Random(seed)
+    with open(file_path, 'w') as fd:
+        for index in range(slide_count):
+            fd.write(generate_slide(rng, index, max_lines, notes_density))
+            fd.write('\n---\n')
+    return file_path
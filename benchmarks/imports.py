@@ -0,0 +1,138 @@
+# Copyright (c) 2017, Samantha Marshall (http://pewpewthespells.com)
+# All rights reserved.
+#
+# https://github.com/samdmarshall/sli
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation and/or
+# other materials provided with the distribution.
+#
+# 3. Neither the name of Samantha Marshall nor the names of its contributors may
+# be used to endorse or promote products derived from this software without
+# specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
+# OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import os
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+from .decks             import generate_deck
+
+# cumulative import time budgets in milliseconds, measured from the first import of sli
+BUDGETS = {
+    'version': 100,
+    'size': 500,
+    'present': 600,
+    'notes': 600,
+}
+
+# modules that only a slide display needs, the budget alone would let these creep back in
+EXCLUDED = {
+    'version': ['sli.render', 'sli.cache', 'sli.agent', 'sli.SocketUtils'],
+    'size': ['sli.render', 'sli.cache', 'sli.agent', 'sli.SocketUtils'],
+}
+
+LAUNCHER = 'import sys; sys.argv = ["sli"] + sys.argv[1:]; import sli; sli.main()'
+
+def subcommand_arguments(deck_path):
+    return {
+        'version': ['--version'],
+        'size': ['size'],
+        'present': ['present', deck_path, '--no-cache'],
+        'notes': ['notes', deck_path, '--no-cache'],
+    }
+
+def parse_import_times(output):
+    # -X importtime prints one line per module, with nesting shown by indenting the module name,
+    # so the unindented entries from `sli` onwards add up to everything the subcommand imported
+    total = 0
+    counting = False
+    modules = list()
+    imported = set()
+    for line in output.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = line.split('|', 2)
+        if not cumulative.strip().isdigit():
+            continue
+        imported.add(name.strip())
+        if name.startswith('  '):
+            continue
+        name = name.strip()
+        counting = counting or name == 'sli'
+        if counting:
+            total += int(cumulative)
+            modules.append((int(cumulative), name))
+    return total / 1000.0, sorted(modules, reverse=True), imported
+
+def measure(arguments, work_path):
+    # without a terminal the display fails to start, which happens after every import is done
+    environment = dict(os.environ, LANG='en_US.UTF-8', HOME=work_path)
+    package_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    environment['PYTHONPATH'] = os.pathsep.join(filter(None, [package_path,
+                                                              os.environ.get('PYTHONPATH')]))
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', LAUNCHER] + arguments,
+                             stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                             stderr=subprocess.PIPE, env=environment, cwd=work_path, timeout=60)
+    return parse_import_times(process.stderr.decode('utf-8', 'replace'))
+
+def main():
+    parser = argparse.ArgumentParser(description='sli import time budget check')
+    parser.add_argument(
+        '--runs',
+        help='Number of runs per subcommand, the fastest one is compared to the budget',
+        action='store',
+        type=int,
+        default=3
+    )
+    args = parser.parse_args()
+
+    results = dict()
+    over_budget = list()
+    unexpected = dict()
+    with tempfile.TemporaryDirectory() as work_path:
+        deck_path = generate_deck(os.path.join(work_path, 'deck.md'), 10)
+        for command, arguments in sorted(subcommand_arguments(deck_path).items()):
+            runs = [measure(arguments, work_path) for _ in range(max(1, args.runs))]
+            elapsed, modules, _ = min(runs, key=lambda run: run[0])
+            imported = set().union(*(run[2] for run in runs))
+            excluded = [name for name in EXCLUDED.get(command, []) if name in imported]
+            results[command] = {
+                'import_ms': elapsed,
+                'budget_ms': BUDGETS[command],
+                'slowest': [{'module': name, 'ms': cumulative / 1000.0}
+                            for cumulative, name in modules[:5]],
+                'excluded_imported': excluded,
+            }
+            if elapsed > BUDGETS[command]:
+                over_budget.append(command)
+            if excluded:
+                unexpected[command] = excluded
+    sys.stdout.write(json.dumps(results, indent=2, sort_keys=True) + '\n')
+    for command in over_budget:
+        sys.stderr.write('%s imports took %.1f ms, over its %d ms budget\n' % (
+            command, results[command]['import_ms'], BUDGETS[command]))
+    for command, names in sorted(unexpected.items()):
+        sys.stderr.write('%s imported %s\n' % (command, ', '.join(names)))
+    return 1 if over_budget or unexpected else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,131 @@
+# Copyright (c) 2017, Samantha Marshall (http://pewpewthespells.com)
+# All rights reserved.
+#
+# https://github.com/samdmarshall/sli
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation and/or
+# other materials provided with the distribution.
+#
+# 3. Neither the name of Samantha Marshall nor the names of its contributors may
+# be used to endorse or promote products derived from this software without
+# specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
+# OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+from sli.reel           import SlideReel
+from sli.store          import SlideBounds, SlideHashes, CompiledSlides
+from .decks             import generate_deck
+from .run               import summarize, sample_indices
+
+DEFAULT_SIZES = '1000,100000'
+
+def retained_size(value, seen=None):
+    # what a structure of lists, tuples, strings and numbers keeps alive, objects shared between
+    # slides such as interned attribute names are only counted once
+    seen = set() if seen is None else seen
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    size = sys.getsizeof(value)
+    if isinstance(value, (list, tuple)):
+        size += sum(retained_size(item, seen) for item in value)
+    return size
+
+def store_size(store):
+    if isinstance(store, SlideBounds):
+        return sys.getsizeof(store) + sys.getsizeof(store.offsets)
+    if isinstance(store, SlideHashes):
+        return sys.getsizeof(store) + sys.getsizeof(store.digests)
+    return sum(sys.getsizeof(value) for value in (store, store.content, store.offsets,
+                                                  store.body_lengths))
+
+def access_times(slides, sample_size):
+    samples = list()
+    for index in sample_indices(len(slides), sample_size):
+        start = time.perf_counter()
+        slides[index]
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+def bench_memory(deck_path, sample_size):
+    deck = SlideReel(deck_path, compile_workers=0)
+    compiled = deck.compile_all()
+    # the lists a deck used to hold, a tuple per bound and nested lists and tuples per slide
+    lists = {
+        'bounds': list(deck.bounds),
+        'hashes': list(deck.hashes),
+        'slides': list(compiled),
+    }
+    stores = {
+        'bounds': deck.bounds,
+        'hashes': deck.hashes,
+        'slides': compiled,
+    }
+    compressed = CompiledSlides(lists['slides'], compress=True)
+    results = {
+        'slides': len(deck),
+        'lists': dict((name, retained_size(value)) for name, value in lists.items()),
+        'compact': dict((name, store_size(value)) for name, value in stores.items()),
+        'compressed_slides': store_size(compressed),
+        'access': {
+            'lists': access_times(lists['slides'], sample_size),
+            'compact': access_times(compiled, sample_size),
+            'compressed': access_times(compressed, sample_size),
+        },
+    }
+    results['lists_bytes'] = sum(results['lists'].values())
+    results['compact_bytes'] = sum(results['compact'].values())
+    results['reduction'] = results['lists_bytes'] / float(results['compact_bytes'])
+    results['compressed_reduction'] = results['lists_bytes'] / float(
+        results['compact_bytes'] - results['compact']['slides'] + results['compressed_slides'])
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description='sli slide storage memory benchmark')
+    parser.add_argument(
+        '--sizes',
+        help='Comma separated slide counts of the generated decks',
+        action='store',
+        default=DEFAULT_SIZES
+    )
+    parser.add_argument(
+        '--samples',
+        help='Number of slides sampled for the access times',
+        action='store',
+        type=int,
+        default=500
+    )
+    args = parser.parse_args()
+
+    results = dict()
+    with tempfile.TemporaryDirectory() as work_path:
+        for slide_count in [int(size) for size in args.sizes.split(',')]:
+            deck_path = generate_deck(os.path.join(work_path, 'deck-%d.md' % slide_count),
+                                      slide_count)
+            results[str(slide_count)] = bench_memory(deck_path, args.samples)
+    sys.stdout.write(json.dumps(results, indent=2, sort_keys=True) + '\n')
+
+if __name__ == '__main__':
+    main()
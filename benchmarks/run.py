@@ -0,0 +1,269 @@
+# Copyright (c) 2017, Samantha Marshall (http://pewpewthespells.com)
+# All rights reserved.
+#
+# https://github.com/samdmarshall/sli
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation and/or
+# other materials provided with the distribution.
+#
+# 3. Neither the name of Samantha Marshall nor the names of its contributors may
+# be used to endorse or promote products derived from this software without
+# specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
+# OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import os
+import sys
+import json
+import time
+import asyncio
+import random
+import socket
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+import statistics
+import urwid
+from sli.reel           import SlideReel
+from sli.render         import SlideDisplay, compile_slide
+from sli.search         import tokenize
+from sli.highlight      import CodeHighlighter
+from sli.ui             import PresentationDisplay
+from sli.agent          import Client, Server
+from .decks             import generate_deck
+
+DEFAULT_SIZES = '10,1000,100000'
+
+class HeadlessScreen(urwid.BaseScreen):
+    def __init__(self, size=(80, 24)):
+        super().__init__()
+        self.size = size
+
+    def get_cols_rows(self):
+        return self.size
+
+    def hook_event_loop(self, event_loop, callback):
+        pass
+
+    def unhook_event_loop(self, event_loop):
+        pass
+
+    def draw_screen(self, size, canvas):
+        # materialising the canvas rows is the work a real screen would have to do before writing
+        for _ in canvas.content():
+            pass
+
+class Recorder(object):
+    def __init__(self):
+        self.received = threading.Event()
+    def process_update(self, data):
+        self.received.set()
+    def process_latency(self, round_trip, clock_offset):
+        pass
+    def current_state(self):
+        return {}
+
+def summarize(samples):
+    samples = sorted(samples)
+    return {
+        'count': len(samples),
+        'mean_us': statistics.mean(samples) * 1e6,
+        'p50_us': samples[len(samples) // 2] * 1e6,
+        'p95_us': samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1e6,
+        'max_us': samples[-1] * 1e6,
+    }
+
+def sample_indices(slide_count, sample_size, seed=0):
+    rng = random.Random(seed)
+    if slide_count <= sample_size:
+        return list(range(slide_count))
+    return rng.sample(range(slide_count), sample_size)
+
+def bench_load(deck_path):
+    start = time.perf_counter()
+    deck = SlideReel(deck_path)
+    deck[0]
+    first_slide = time.perf_counter() - start
+    deck.indexed.wait()
+    indexed = time.perf_counter() - start
+    return deck, {'first_slide_s': first_slide, 'indexed_s': indexed, 'slides': len(deck)}
+
+def bench_render(deck, sample_size):
+    compile_times = list()
+    render_times = list()
+    highlight_times = list()
+    cached_times = list()
+    renderer = SlideDisplay()
+    highlighter = CodeHighlighter()
+    for index in sample_indices(len(deck), sample_size):
+        source = deck.source(index)
+        start = time.perf_counter()
+        contents = compile_slide(source)
+        compile_times.append(time.perf_counter() - start)
+        # the first highlight tokenizes every block, after that the token cache is hit
+        start = time.perf_counter()
+        highlighter.highlight_now(contents)
+        highlight_times.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        highlighter.highlight(contents)
+        cached_times.append(time.perf_counter() - start)
+        for show_notes in (False, True):
+            renderer.set_presenter_notes(show_notes)
+            start = time.perf_counter()
+            renderer.render(contents)
+            render_times.append(time.perf_counter() - start)
+    return {
+        'compile': summarize(compile_times),
+        'render': summarize(render_times),
+        'highlight': summarize(highlight_times),
+        'highlight_cached': summarize(cached_times),
+    }
+
+def bench_search(deck, sample_size):
+    start = time.perf_counter()
+    index = deck.search_index()
+    build = time.perf_counter() - start
+    # queries are typed out a character at a time like the search prompt, over words from the deck
+    queries = list()
+    for slide in sample_indices(len(deck), sample_size):
+        words = tokenize(deck.source(slide))[:2]
+        typed = ' '.join(words)
+        queries.extend(typed[:length] for length in range(1, len(typed) + 1))
+    samples = list()
+    for position, query in enumerate(queries):
+        start = time.perf_counter()
+        index.next_match(query, position % len(deck))
+        samples.append(time.perf_counter() - start)
+    return {'build_s': build, 'query': summarize(samples)}
+
+def bench_navigation(deck, sample_size, socket_path):
+    presentation = PresentationDisplay(deck, 0, address=socket_path)
+    presentation.setup(HeadlessScreen())
+    # lets the display's agent bind its socket, as it would on the first tick of the main loop
+    presentation.getEventLoop().run_until_complete(asyncio.sleep(0))
+    samples = list()
+    for _ in range(min(sample_size, len(deck) - 1)):
+        start = time.perf_counter()
+        presentation.handleInput(['right'])
+        # stands in for the draw MainLoop makes once it has handled an input batch
+        presentation.draw()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+def bench_round_trip(address, iterations):
+    server = Server(address)
+    server.start()
+    recorder = Recorder()
+    client = Client(address)
+    client.update_delegate = recorder
+    client.start()
+    # the snapshot sent on connect shows the link is up
+    recorder.received.wait(10)
+    samples = list()
+    for index in range(iterations):
+        recorder.received.clear()
+        start = time.perf_counter()
+        server.send_data({'slide': index}, 'slide')
+        recorder.received.wait(10)
+        samples.append(time.perf_counter() - start)
+    client.close()
+    server.close()
+    return summarize(samples)
+
+def free_port():
+    probe = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    probe.bind(('127.0.0.1', 0))
+    port = probe.getsockname()[1]
+    probe.close()
+    return port
+
+def git_revision():
+    try:
+        output = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                         stderr=subprocess.DEVNULL)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return output.decode('utf-8').strip()
+
+def main():
+    parser = argparse.ArgumentParser(description='sli performance benchmarks')
+    parser.add_argument(
+        '--sizes',
+        help='Comma separated slide counts of the generated decks',
+        action='store',
+        default=DEFAULT_SIZES
+    )
+    parser.add_argument(
+        '--samples',
+        help='Number of slides sampled for the per-slide measurements',
+        action='store',
+        type=int,
+        default=500
+    )
+    parser.add_argument(
+        '--iterations',
+        help='Number of presenter to notes round trips to time',
+        action='store',
+        type=int,
+        default=500
+    )
+    parser.add_argument(
+        '--output',
+        help='Writes the JSON results to this path instead of stdout',
+        action='store',
+        default=None
+    )
+    args = parser.parse_args()
+
+    results = {
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': time.time(),
+        'decks': dict(),
+    }
+    with tempfile.TemporaryDirectory() as work_path:
+        for slide_count in [int(size) for size in args.sizes.split(',')]:
+            deck_path = generate_deck(os.path.join(work_path, 'deck-%d.md' % slide_count),
+                                      slide_count)
+            deck, load = bench_load(deck_path)
+            results['decks'][str(slide_count)] = {
+                'bytes': os.path.getsize(deck_path),
+                'load': load,
+                'render': bench_render(deck, args.samples),
+                'search': bench_search(deck, args.samples),
+                'navigation': bench_navigation(deck, args.samples,
+                                               os.path.join(work_path, 'nav-%d' % slide_count)),
+            }
+        results['round_trip'] = {
+            'unix': bench_round_trip(os.path.join(work_path, 'ipc'), args.iterations),
+            'tcp': bench_round_trip(('127.0.0.1', free_port()), args.iterations),
+        }
+
+    output = json.dumps(results, indent=2, sort_keys=True)
+    if args.output is None:
+        sys.stdout.write(output + '\n')
+    else:
+        with open(args.output, 'w') as fd:
+            fd.write(output + '\n')
+
+if __name__ == '__main__':
+    main()
@@ -45,9 +45,9 @@ setup(
         'console_scripts': [ 'sli = sli:main' ] 
     },
     zip_safe = False,
+    python_requires = '>=3.10',
     install_requires = [
-        'Markdown>=2.6.7',
         'switch>=1.1.0',
-        'urwid>=1.3.1',
+        'urwid>=2.4.0',
     ]
 )
@@ -32,38 +32,155 @@
 
 import os
 import json
-import socket
+import time
+import struct
+import asyncio
+import threading
+import collections
+from .Logger        import Logger
 
-def start_client(agent):
-    agent.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
-    agent.socket.connect(agent.address)
-    read_stream(agent)
+PROTOCOL_VERSION = 1
+FRAME_HEADER = struct.Struct('!BI')
+MAX_FRAME_SIZE = 16 * 1024 * 1024
+DEFAULT_SOCKET_PATH = '/tmp/sli-socket'
 
-def start_server(agent):
-    agent.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+def encode_frame(obj):
+    payload = str.encode(json.dumps(obj))
+    return FRAME_HEADER.pack(PROTOCOL_VERSION, len(payload)) + payload
+
+class FrameReader(object):
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def feed(self, data):
+        self.buffer.extend(data)
+        while len(self.buffer) >= FRAME_HEADER.size:
+            version, length = FRAME_HEADER.unpack_from(self.buffer)
+            if version != PROTOCOL_VERSION:
+                raise ValueError('unsupported protocol version %d' % version)
+            if length > MAX_FRAME_SIZE:
+                raise ValueError('frame of %d bytes exceeds the maximum size' % length)
+            frame_end = FRAME_HEADER.size + length
+            if len(self.buffer) < frame_end:
+                break
+            payload = bytes(self.buffer[FRAME_HEADER.size:frame_end])
+            del self.buffer[:frame_end]
+            yield json.loads(payload.decode('utf-8'))
+
+class Outbox(object):
+    def __init__(self):
+        self.pending = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.counter = 0
+
+    def put(self, obj, key=None):
+        with self.lock:
+            pending_key = key
+            if pending_key is None:
+                self.counter += 1
+                pending_key = self.counter
+            # a newer message with the same key replaces the queued one, so a burst of slide
+            # changes only sends the latest position
+            self.pending.pop(pending_key, None)
+            self.pending[pending_key] = (key, obj)
+
+    def take(self):
+        with self.lock:
+            messages = list(self.pending.values())
+            self.pending.clear()
+            return messages
+
+class Peer(asyncio.Protocol):
+    def __init__(self, agent):
+        self.agent = agent
+        self.reader = FrameReader()
+        self.outbox = Outbox()
+        self.transport = None
+        self.paused = False
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.agent.peer_connected(self)
+
+    def connection_lost(self, exc):
+        self.transport = None
+        self.agent.peer_disconnected(self)
+
+    def data_received(self, data):
+        try:
+            messages = list(self.reader.feed(data))
+        except ValueError as error:
+            Logger.write().error('Dropping connection: %s' % error)
+            self.transport.close()
+            return
+        for json_data in messages:
+            try:
+                self.agent.receive(self, json_data)
+            except Exception as error:
+                # a message this side cannot apply is skipped rather than taking the display down
+                Logger.write().debug('Ignoring message %s: %s' % (json_data, error))
+
+    # each peer queues its own messages, so a client that stops reading only holds back itself
+    def pause_writing(self):
+        self.paused = True
+
+    def resume_writing(self):
+        self.paused = False
+        self.flush()
+
+    def send(self, obj, key=None):
+        self.outbox.put(obj, key)
+        self.flush()
+
+    def flush(self):
+        if self.transport is None or self.paused:
+            return
+        messages = self.outbox.take()
+        if messages:
+            self.transport.write(b''.join(encode_frame(obj) for _, obj in messages))
+
+async def start_client(agent):
+    loop = asyncio.get_running_loop()
+    try:
+        if isinstance(agent.address, tuple):
+            host, port = agent.address
+            await loop.create_connection(lambda: Peer(agent), host or 'localhost', port)
+        else:
+            await loop.create_unix_connection(lambda: Peer(agent), agent.address)
+    except OSError as error:
+        Logger.write().debug('Unable to connect to %s: %s' % (str(agent.address), error))
+        return False
+    return True
+
+async def start_server(agent):
+    loop = asyncio.get_running_loop()
+    if isinstance(agent.address, tuple):
+        host, port = agent.address
+        agent.socket = await loop.create_server(lambda: Peer(agent), host or None, port)
+        return
     try:
         os.remove(agent.address)
     except OSError:
         pass
-    agent.socket.bind(agent.address)
-    agent.socket.listen(1)
-    agent.connection, _ = agent.socket.accept()
-    read_stream(agent)
-
-def read_stream(agent):
-    while True:
-        data = agent.get_stream().recv(1024)
-        if not data:
-            break
-        json_data = json.loads(data)
-        agent.process(json_data)
-
-def write_stream(agent, obj):
-    json_data = json.dumps(obj)
-    raw_data = str.encode(json_data)
-    if agent.get_stream() is not None:
-        try:
-            agent.get_stream().send(raw_data)
-        except:
-            pass
-    
+    agent.socket = await loop.create_unix_server(lambda: Peer(agent), agent.address)
+
+class ClockSync(object):
+    def __init__(self, sample_count=8):
+        self.samples = collections.deque(maxlen=sample_count)
+        self.round_trip = None
+        self.clock_offset = None
+
+    def ping(self):
+        return {'ping': time.time()}
+
+    def pong(self, data):
+        return {'pong': data['ping'], 'time': time.time()}
+
+    def record(self, data):
+        received = time.time()
+        round_trip = received - data['pong']
+        clock_offset = data['time'] - (data['pong'] + received) / 2.0
+        self.samples.append((round_trip, clock_offset))
+        self.round_trip = round_trip
+        # the sample with the shortest round trip has the least queueing noise in its offset
+        self.clock_offset = min(self.samples)[1]
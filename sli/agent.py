@@ -30,36 +30,183 @@
 # OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
 # OF THE POSSIBILITY OF SUCH DAMAGE.
 
+import os
+import time
 import _thread
+import asyncio
 from .              import SocketUtils
+from .Logger        import Logger
+from .timing        import Profiler
+
+PING_INTERVAL = 1.0
+RECONNECT_DELAY = 0.1
+MAX_RECONNECT_DELAY = 5.0
+
+def message_key(obj):
+    if 'slide' in obj.keys():
+        return 'slide'
+    return None
 
 class Agent(object):
-    def __init__(self, socket_path='/tmp/sli-socket'):
-        self.address = socket_path
-        self.connection = None
+    def __init__(self, address=None):
+        self.address = address if address is not None else SocketUtils.DEFAULT_SOCKET_PATH
         self.socket = None
+        self.loop = None
+        self.closed = False
+        self.peers = list()
         self.update_delegate = None
-    def start(self):
+        self.outbox = SocketUtils.Outbox()
+    def start(self, loop=None):
+        # without a loop to share, the agent runs one of its own on a background thread
+        if loop is None:
+            loop = asyncio.new_event_loop()
+            _thread.start_new_thread(loop.run_forever, ())
+        self.loop = loop
+        asyncio.run_coroutine_threadsafe(self.open(), self.loop)
+    async def open(self):
         pass
-    def get_stream(self):
-        pass
-    def send_data(self, obj={}):
-        SocketUtils.write_stream(self, obj)
+    def send_data(self, obj={}, key=None):
+        self.outbox.put(obj, key)
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.flush)
+    def flush(self):
+        if not self.peers:
+            return
+        for key, obj in self.outbox.take():
+            self.broadcast(obj, key)
+    def broadcast(self, obj, key=None, sender=None):
+        for peer in self.peers:
+            if peer is not sender:
+                peer.send(obj, key)
+    def peer_connected(self, peer):
+        self.peers.append(peer)
+        self.flush()
+    def peer_disconnected(self, peer):
+        if peer in self.peers:
+            self.peers.remove(peer)
+    def receive(self, peer, data):
+        self.process(data)
     def close(self):
-        if self.get_stream() is not None:
-            self.get_stream().close()
+        self.closed = True
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.shutdown)
+    def shutdown(self):
+        for peer in list(self.peers):
+            peer.transport.close()
+        if self.socket is not None:
+            self.socket.close()
     def process(self, data):
         if self.update_delegate is not None:
             self.update_delegate.process_update(data)
 
 class Client(Agent):
-    def get_stream(self):
-        return self.socket
-    def start(self):
-        _thread.start_new_thread(SocketUtils.start_client, (self,))
+    def __init__(self, address=None):
+        super().__init__(address)
+        self.clock = SocketUtils.ClockSync()
+        self.ping_handle = None
+        self.reconnect_delay = RECONNECT_DELAY
+        self.identity = os.urandom(8).hex()
+        self.session = None
+        self.last_sequence = 0
+        self.local_sequence = 0
+        self.acknowledged = 0
+    async def open(self):
+        while not self.closed:
+            if await SocketUtils.start_client(self):
+                return
+            await asyncio.sleep(self.reconnect_delay)
+            self.reconnect_delay = min(self.reconnect_delay * 2, MAX_RECONNECT_DELAY)
+    def send_data(self, obj={}, key=None):
+        if key == 'slide':
+            self.local_sequence += 1
+            obj = dict(obj, origin=self.identity, local=self.local_sequence)
+        super().send_data(obj, key)
+    def peer_connected(self, peer):
+        self.reconnect_delay = RECONNECT_DELAY
+        super().peer_connected(peer)
+        self.ping()
+    def peer_disconnected(self, peer):
+        super().peer_disconnected(peer)
+        if self.ping_handle is not None:
+            self.ping_handle.cancel()
+            self.ping_handle = None
+        if not self.closed:
+            Logger.write().debug('Lost connection to %s, reconnecting' % str(self.address))
+            self.loop.create_task(self.open())
+    def ping(self):
+        for peer in self.peers:
+            peer.send(self.clock.ping(), 'ping')
+        self.ping_handle = self.loop.call_later(PING_INTERVAL, self.ping)
+    def is_current(self, data):
+        if 'seq' not in data.keys():
+            return True
+        # a restarted server counts from zero again, sequence numbers only compare within a session
+        if data['session'] != self.session:
+            self.session = data['session']
+            self.last_sequence = 0
+            # changes sent to the old session will never be echoed, the new one's state wins
+            self.acknowledged = self.local_sequence
+        if data['seq'] <= self.last_sequence:
+            return False
+        self.last_sequence = data['seq']
+        if data.get('origin') == self.identity:
+            # our own change coming back, the display is already showing it or something newer
+            self.acknowledged = max(self.acknowledged, data['local'])
+            return False
+        if data.get('snapshot') and self.acknowledged < self.local_sequence:
+            return False
+        return True
+    def receive(self, peer, data):
+        if 'pong' in data.keys():
+            self.clock.record(data)
+            Profiler.record('ipc.round_trip', self.clock.round_trip)
+            if self.update_delegate is not None:
+                self.update_delegate.process_latency(self.clock.round_trip, self.clock.clock_offset)
+            return
+        if 'time' in data.keys() and self.clock.clock_offset is not None:
+            Profiler.record('ipc.latency', time.time() - (data['time'] - self.clock.clock_offset))
+        if self.is_current(data):
+            self.process(data)
 
 class Server(Agent):
-    def get_stream(self):
-        return self.connection
-    def start(self):
-        _thread.start_new_thread(SocketUtils.start_server, (self,))
+    def __init__(self, address=None):
+        super().__init__(address)
+        self.clock = SocketUtils.ClockSync()
+        self.session = os.urandom(8).hex()
+        self.sequence = 0
+        self.state = dict()
+        self.recorder = None
+    async def open(self):
+        await SocketUtils.start_server(self)
+    def stamp(self, obj):
+        self.sequence += 1
+        stamped = dict(obj, seq=self.sequence, session=self.session, time=time.time())
+        if self.recorder is not None and 'slide' in obj.keys() and not obj.get('snapshot'):
+            self.recorder.append(stamped['time'], self.sequence, obj['slide'])
+        return stamped
+    def snapshot(self):
+        state = dict(self.state)
+        if self.update_delegate is not None:
+            state.update(self.update_delegate.current_state())
+        state['snapshot'] = True
+        return self.stamp(state)
+    def flush(self):
+        for key, obj in self.outbox.take():
+            if key is not None:
+                self.state.update(obj)
+            self.broadcast(self.stamp(obj), key)
+    def peer_connected(self, peer):
+        self.peers.append(peer)
+        # clients joining part way through, or coming back after a restart, start from the
+        # current state rather than waiting for the next change
+        peer.send(self.snapshot(), 'slide')
+    def receive(self, peer, data):
+        if 'ping' in data.keys():
+            peer.send(self.clock.pong(data), 'pong')
+            return
+        key = message_key(data)
+        if key is not None:
+            self.state['slide'] = data['slide']
+        # the sender gets its own change back too, so that its sequence number stays current
+        self.broadcast(self.stamp(data), key)
+        self.process(data)
@@ -0,0 +1,157 @@
+# Copyright (c) 2017, Samantha Marshall (http://pewpewthespells.com)
+# All rights reserved.
+#
+# https://github.com/samdmarshall/sli
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation and/or
+# other materials provided with the distribution.
+#
+# 3. Neither the name of Samantha Marshall nor the names of its contributors may
+# be used to endorse or promote products derived from this software without
+# specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
+# OF THE POSSIBILITY OF SUCH DAMAGE.
+import os
+import struct
+import tempfile
+from .cache         import deck_hash, CACHE_FORMAT_VERSION
+from .render        import COMPILER_VERSION
+
+BUNDLE_MAGIC = b'SLIB'
+BUNDLE_VERSION = 2
+# magic, bundle version, compiler version, deck hash version, slide count, source offset and
+# length, index offset, deck hash of the source
+BUNDLE_HEADER = struct.Struct('!4sBBBxIQQQ64s')
+# source, body and notes offsets and lengths, then the sha1 of the slide source
+INDEX_ENTRY = struct.Struct('!QIQIQI20s')
+# body and notes are each stored as lines of segments, a line is the length of its kind, which is
+# left empty for the section's own kind, and its segment count, then the kind itself. a segment is
+# an index into SEGMENT_ATTRIBUTES followed by the length of its utf-8 text
+LINE_HEADER = struct.Struct('!BH')
+SEGMENT_HEADER = struct.Struct('!BI')
+SEGMENT_ATTRIBUTES = (None, 'h1', 'h2', 'h3', 'strong', 'emphasis', 'code', 'link', 'image',
+                      'quote', 'bullet', 'strong.emphasis', 'quote.strong', 'quote.emphasis',
+                      'quote.strong.emphasis')
+
+def is_bundle(data):
+    return data[:len(BUNDLE_MAGIC)] == BUNDLE_MAGIC
+
+def encode_lines(lines, section_kind):
+    encoded = list()
+    for kind, segments in lines:
+        kind = b'' if kind == section_kind else kind.encode('utf-8')
+        encoded.append(LINE_HEADER.pack(len(kind), len(segments)))
+        encoded.append(kind)
+        for attr, text in segments:
+            text = text.encode('utf-8')
+            encoded.append(SEGMENT_HEADER.pack(SEGMENT_ATTRIBUTES.index(attr), len(text)))
+            encoded.append(text)
+    return b''.join(encoded)
+
+def decode_lines(data, section_kind):
+    lines = list()
+    offset = 0
+    while offset < len(data):
+        kind_length, segment_count = LINE_HEADER.unpack_from(data, offset)
+        offset += LINE_HEADER.size
+        kind = str(data[offset:offset + kind_length], 'utf-8') or section_kind
+        offset += kind_length
+        segments = list()
+        for _ in range(segment_count):
+            attr, length = SEGMENT_HEADER.unpack_from(data, offset)
+            offset += SEGMENT_HEADER.size
+            segments.append((SEGMENT_ATTRIBUTES[attr], str(data[offset:offset + length], 'utf-8')))
+            offset += length
+        lines.append((kind, segments))
+    return lines
+
+def write_bundle(output_path, raw_data, bounds, hashes, records):
+    # each record is a slide's encoded body and notes back to back, and the length of the body
+    source_offset = BUNDLE_HEADER.size
+    content_offset = source_offset + len(raw_data)
+    entries = list()
+    content = list()
+    for (start, end), slide_hash, (encoded, body_length) in zip(bounds, hashes, records):
+        body_offset = content_offset
+        notes_offset = body_offset + body_length
+        content_offset = body_offset + len(encoded)
+        entries.append(INDEX_ENTRY.pack(source_offset + start, end - start, body_offset,
+                                        body_length, notes_offset, len(encoded) - body_length,
+                                        slide_hash))
+        content.append(encoded)
+    header = BUNDLE_HEADER.pack(BUNDLE_MAGIC, BUNDLE_VERSION, COMPILER_VERSION,
+                                CACHE_FORMAT_VERSION, len(entries), source_offset, len(raw_data),
+                                content_offset, deck_hash(raw_data).encode('ascii'))
+    output_directory = os.path.dirname(os.path.abspath(output_path))
+    fd, temp_path = tempfile.mkstemp(dir=output_directory, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as temp_file:
+        temp_file.write(header)
+        temp_file.write(raw_data)
+        for chunk in content:
+            temp_file.write(chunk)
+        for entry in entries:
+            temp_file.write(entry)
+    os.chmod(temp_path, 0o644)
+    os.replace(temp_path, output_path)
+
+class SlideBundle(object):
+    def __init__(self, data):
+        fields = BUNDLE_HEADER.unpack_from(data, 0)
+        magic, version, compiler_version, hash_version, count = fields[:5]
+        if magic != BUNDLE_MAGIC or version != BUNDLE_VERSION:
+            raise ValueError('unsupported slide bundle format')
+        self.data = data
+        self.count = count
+        self.source_offset, self.source_length, self.index_offset = fields[5:8]
+        self.current = compiler_version == COMPILER_VERSION and hash_version == CACHE_FORMAT_VERSION
+        self.deck_hash = fields[8].decode('ascii')
+        if self.index_offset + count * INDEX_ENTRY.size > len(data):
+            raise ValueError('truncated slide bundle')
+        self.bounds = BundleView(self, lambda entry: (entry[0], entry[0] + entry[1]))
+        self.hashes = BundleView(self, lambda entry: entry[6])
+        self.slides = BundleView(self, self.decode_slide)
+
+    def source(self):
+        return memoryview(self.data)[self.source_offset:self.source_offset + self.source_length]
+
+    def entry(self, index):
+        if not 0 <= index < self.count:
+            raise IndexError('slide index out of range')
+        return INDEX_ENTRY.unpack_from(self.data, self.index_offset + index * INDEX_ENTRY.size)
+
+    def decode_slide(self, entry):
+        view = memoryview(self.data)
+        body = decode_lines(view[entry[2]:entry[2] + entry[3]], 'body')
+        notes = decode_lines(view[entry[4]:entry[4] + entry[5]], 'note')
+        return body + notes
+
+class BundleView(object):
+    # a read only sequence over one field of the bundle index, entries are unpacked on access so
+    # opening a bundle costs the same regardless of how many slides it has
+    def __init__(self, bundle, field):
+        self.bundle = bundle
+        self.field = field
+
+    def __len__(self):
+        return self.bundle.count
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.bundle.count
+        return self.field(self.bundle.entry(index))
@@ -0,0 +1,112 @@
+# Copyright (c) 2017, Samantha Marshall (http://pewpewthespells.com)
+# All rights reserved.
+#
+# https://github.com/samdmarshall/sli
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation and/or
+# other materials provided with the distribution.
+#
+# 3. Neither the name of Samantha Marshall nor the names of its contributors may
+# be used to endorse or promote products derived from this software without
+# specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
+# OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import os
+import json
+import hashlib
+import tempfile
+from .Logger        import Logger
+from .render        import COMPILER_VERSION
+
+DEFAULT_SIZE_LIMIT = 64 * 1024 * 1024
+CACHE_FORMAT_VERSION = 4
+BUNDLE_DIRECTORY = 'bundles'
+
+def cache_directory():
+    cache_home = os.environ.get('XDG_CACHE_HOME', '')
+    if not os.path.isabs(cache_home):
+        cache_home = os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cache_home, 'sli')
+
+def deck_hash(raw_data):
+    digest = hashlib.sha256()
+    digest.update(str.encode('%d-compiler-%d\0' % (CACHE_FORMAT_VERSION, COMPILER_VERSION)))
+    digest.update(raw_data)
+    return digest.hexdigest()
+
+class DeckCache(object):
+    def __init__(self, path=None, size_limit=DEFAULT_SIZE_LIMIT):
+        self.path = path if path is not None else cache_directory()
+        self.size_limit = size_limit
+
+    def entry_path(self, key):
+        return os.path.join(self.path, key + '.json')
+
+    def load(self, key):
+        entry_path = self.entry_path(key)
+        try:
+            with open(entry_path, 'r') as fd:
+                entry = json.load(fd)
+            # touching the entry keeps eviction least-recently-used rather than oldest-written
+            os.utime(entry_path, None)
+        except (OSError, ValueError):
+            return None
+        return entry
+
+    def store(self, key, entry):
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=self.path, suffix='.tmp')
+            with os.fdopen(fd, 'w') as temp_file:
+                json.dump(entry, temp_file)
+            os.replace(temp_path, self.entry_path(key))
+        except OSError as error:
+            Logger.write().warning('Unable to write deck cache entry: %s' % error)
+            return
+        self.evict()
+
+    def evict(self):
+        # bundles the daemon keeps compiled count against the same limit as the cache entries
+        entries = list()
+        bundle_path = os.path.join(self.path, BUNDLE_DIRECTORY)
+        for directory, extension in ((self.path, '.json'), (bundle_path, '.sli')):
+            try:
+                names = os.listdir(directory)
+            except OSError:
+                continue
+            for name in names:
+                if not name.endswith(extension):
+                    continue
+                entry_path = os.path.join(directory, name)
+                try:
+                    info = os.stat(entry_path)
+                except OSError:
+                    continue
+                entries.append((info.st_mtime, info.st_size, entry_path))
+        entries.sort()
+        total_size = sum(size for _, size, _ in entries)
+        # the newest entry was just written and stays, even when it alone is over the limit
+        while len(entries) > 1 and total_size > self.size_limit:
+            _, size, entry_path = entries.pop(0)
+            try:
+                os.remove(entry_path)
+            except OSError:
+                pass
+            total_size -= size
@@ -0,0 +1,215 @@
+# Copyright (c) 2017, Samantha Marshall (http://pewpewthespells.com)
+# All rights reserved.
+#
+# https://github.com/samdmarshall/sli
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation and/or
+# other materials provided with the distribution.
+#
+# 3. Neither the name of Samantha Marshall nor the names of its contributors may
+# be used to endorse or promote products derived from this software without
+# specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
+# OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import os
+import signal
+import socket
+import hashlib
+import asyncio
+import threading
+import concurrent.futures
+from .              import SocketUtils
+from .Logger        import Logger
+from .agent         import Agent
+from .bundle        import is_bundle
+from .cache         import DeckCache, cache_directory, BUNDLE_DIRECTORY
+from .timing        import Profiler
+
+ATTACH_TIMEOUT = 30.0
+
+def daemon_socket_path():
+    # the socket belongs to one user, in their runtime directory or named after them under /tmp
+    runtime_directory = os.environ.get('XDG_RUNTIME_DIR', '')
+    if os.path.isabs(runtime_directory) and os.path.isdir(runtime_directory):
+        return os.path.join(runtime_directory, 'sli-daemon')
+    return '/tmp/sli-daemon-%d' % os.getuid()
+
+def bundle_directory():
+    return os.path.join(cache_directory(), BUNDLE_DIRECTORY)
+
+def deck_bundle_path(deck_path):
+    bundle_name = hashlib.sha1(os.fsencode(deck_path)).hexdigest() + '.sli'
+    return os.path.join(bundle_directory(), bundle_name)
+
+def trusted_reply(deck_path, reply):
+    # only bundles in this user's own cache are mapped, or the deck itself when it is a bundle
+    deck_path = os.path.realpath(deck_path)
+    bundle_path = os.path.realpath(reply.get('bundle', ''))
+    if reply.get('deck') != deck_path:
+        return False
+    if bundle_path == deck_path:
+        return True
+    return os.path.dirname(bundle_path) == os.path.realpath(bundle_directory())
+
+def attach(deck_path, address=None, timeout=ATTACH_TIMEOUT):
+    # asks a running daemon for the bundle it keeps for this deck, a blocking round trip keeps
+    # this path free of an event loop. anything short of an answer means there is no daemon
+    address = address if address is not None else daemon_socket_path()
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    connection.settimeout(timeout)
+    try:
+        if os.stat(address).st_uid != os.getuid():
+            Logger.write().warning('Not using the sli daemon at %s, it belongs to another user' %
+                                   address)
+            return None
+        connection.connect(address)
+        connection.sendall(SocketUtils.encode_frame({'open': os.path.abspath(deck_path)}))
+        reader = SocketUtils.FrameReader()
+        while True:
+            data = connection.recv(65536)
+            if not data:
+                return None
+            for reply in reader.feed(data):
+                if 'error' in reply.keys():
+                    Logger.write().warning('The sli daemon could not open %s: %s' % (deck_path,
+                                                                                    reply['error']))
+                    return None
+                if not trusted_reply(deck_path, reply):
+                    Logger.write().warning('Not using the bundle the sli daemon named for %s' %
+                                           deck_path)
+                    return None
+                return reply
+    except (OSError, ValueError) as error:
+        Logger.write().debug('Not using the sli daemon: %s' % error)
+        return None
+    finally:
+        connection.close()
+
+class WarmDeck(object):
+    def __init__(self, deck_path, deck_cache=None, compile_workers=0, bundle_cache=None):
+        from .reel      import SlideReel
+        self.deck = SlideReel(deck_path, deck_cache=deck_cache, compile_workers=compile_workers)
+        self.bundle_path = deck_bundle_path(deck_path)
+        self.bundle_cache = bundle_cache if bundle_cache is not None else DeckCache()
+        self.lock = threading.Lock()
+
+    def start(self):
+        from .watch     import FileWatcher
+        self.write()
+        FileWatcher(self.deck.pres_path, self.reload).start()
+
+    def write(self):
+        with Profiler.timed('daemon.bundle'):
+            self.deck.write_bundle(self.bundle_path)
+        self.bundle_cache.evict()
+
+    def bundle(self):
+        with self.lock:
+            try:
+                # opening a deck marks its bundle as recently used for the cache's eviction
+                os.utime(self.bundle_path)
+            except OSError:
+                # evicted to keep the cache within its size limit while the deck stayed warm
+                self.write()
+        return self.bundle_path
+
+    def reload(self):
+        with self.lock:
+            try:
+                if self.deck.reload():
+                    self.write()
+            except (OSError, ValueError) as error:
+                Logger.write().warning('Unable to reload %s: %s' % (self.deck.pres_path, error))
+
+class DeckDaemon(Agent):
+    def __init__(self, address=None, deck_cache=None, compile_workers=0):
+        super().__init__(address if address is not None else daemon_socket_path())
+        self.deck_cache = deck_cache
+        self.compile_workers = compile_workers
+        # bundles live inside the cache directory and are evicted with its entries
+        self.bundle_cache = deck_cache if deck_cache is not None else DeckCache()
+        self.decks = dict()
+        self.lock = threading.Lock()
+
+    async def open(self):
+        await SocketUtils.start_server(self)
+        os.chmod(self.address, 0o600)
+
+    async def serve(self, deck_paths=()):
+        self.loop = asyncio.get_running_loop()
+        os.makedirs(bundle_directory(), exist_ok=True)
+        for deck_path in deck_paths:
+            self.loop.run_in_executor(None, self.warm_deck, deck_path)
+        await self.open()
+        # stopping the server ends serve_forever, so a terminated daemon cleans up its socket
+        self.loop.add_signal_handler(signal.SIGTERM, self.socket.close)
+        try:
+            await self.socket.serve_forever()
+        except asyncio.CancelledError:
+            pass
+        finally:
+            try:
+                os.remove(self.address)
+            except OSError:
+                pass
+
+    def deck_path(self, path):
+        return os.path.realpath(os.path.expanduser(path))
+
+    def warm_deck(self, path):
+        deck_path = self.deck_path(path)
+        if not os.path.isfile(deck_path):
+            raise OSError('%s does not exist' % deck_path)
+        with open(deck_path, 'rb') as fd:
+            if is_bundle(fd.read(4)):
+                # compiled bundles are already memory mappable, clients open them directly
+                return deck_path
+        # the lock only guards the table, a deck compiling never holds up opening the others
+        with self.lock:
+            loading = self.decks.get(deck_path)
+            loader = loading is None
+            if loader:
+                loading = concurrent.futures.Future()
+                self.decks[deck_path] = loading
+        if loader:
+            Logger.write().info('Loading %s' % deck_path)
+            try:
+                warm = WarmDeck(deck_path, self.deck_cache, self.compile_workers, self.bundle_cache)
+                warm.start()
+            except Exception as error:
+                # a deck that failed to load is tried again by the next open
+                with self.lock:
+                    del self.decks[deck_path]
+                loading.set_exception(error)
+                raise
+            loading.set_result(warm)
+        return loading.result().bundle()
+
+    def receive(self, peer, data):
+        if 'open' not in data.keys():
+            return
+        opening = self.loop.run_in_executor(None, self.warm_deck, data['open'])
+        opening.add_done_callback(lambda future: peer.send(self.opened(data['open'], future)))
+
+    def opened(self, path, future):
+        try:
+            return {'deck': self.deck_path(path), 'bundle': future.result()}
+        except (OSError, ValueError) as error:
+            return {'error': str(error)}
@@ -0,0 +1,136 @@
+# Copyright (c) 2017, Samantha Marshall (http://pewpewthespells.com)
+# All rights reserved.
+#
+# https://github.com/samdmarshall/sli
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation and/or
+# other materials provided with the distribution.
+#
+# 3. Neither the name of Samantha Marshall nor the names of its contributors may
+# be used to endorse or promote products derived from this software without
+# specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
+# OF THE POSSIBILITY OF SUCH DAMAGE.
+import os
+import sys
+import functools
+import collections
+import concurrent.futures
+import urwid
+from .palette       import PALETTE
+from .render        import SlideDisplay, compile_slide
+from .highlight     import CodeHighlighter
+
+DEFAULT_WIDTH = 80
+DEFAULT_CHUNK_SIZE = 16
+PAGE_BREAK = '\f\n'
+ANSI_RESET = '\x1b[0m'
+
+def escape_code(foreground, background):
+    spec = urwid.AttrSpec(foreground, background, 16)
+    codes = list()
+    for enabled, code in ((spec.bold, 1), (spec.italics, 3), (spec.underline, 4),
+                          (spec.standout, 7)):
+        if enabled:
+            codes.append(code)
+    if spec.foreground_basic:
+        number = spec.foreground_number
+        codes.append(30 + number if number < 8 else 90 + number - 8)
+    return '\x1b[%sm' % ';'.join(str(code) for code in codes)
+
+ESCAPE_CODES = dict((name, escape_code(foreground, background))
+                    for name, foreground, background in PALETTE)
+
+def render_page(markup, width, ansi):
+    canvas = urwid.Text(markup).render((width,))
+    lines = list()
+    for row in canvas.content():
+        line = ''
+        for attr, _, text in row:
+            text = text.decode('utf-8')
+            if ansi and attr in ESCAPE_CODES:
+                text = ESCAPE_CODES[attr] + text + ANSI_RESET
+            line += text
+        lines.append(line.rstrip() + '\n')
+    return ''.join(lines)
+
+def export_slides(page_texts, show_notes, width, ansi):
+    renderer = SlideDisplay()
+    renderer.set_presenter_notes(show_notes)
+    highlighter = CodeHighlighter()
+    pages = list()
+    for page_text in page_texts:
+        slide_contents = compile_slide(page_text)
+        if ansi and not show_notes:
+            slide_contents = highlighter.highlight_now(slide_contents)
+        pages.append(render_page(renderer.render(slide_contents), width, ansi))
+    return pages
+
+def source_chunks(deck, chunk_size):
+    # chunks are handed out while the deck is still being indexed
+    index = 0
+    while deck.has_slide(index):
+        chunk = list()
+        while len(chunk) < chunk_size and deck.has_slide(index):
+            chunk.append(deck.source(index))
+            index += 1
+        yield chunk
+
+def export_deck(deck, show_notes=False, width=DEFAULT_WIDTH, ansi=False, jobs=None,
+                chunk_size=None):
+    chunks = source_chunks(deck, chunk_size or DEFAULT_CHUNK_SIZE)
+    render_chunk = functools.partial(export_slides, show_notes=show_notes, width=width, ansi=ansi)
+    if jobs == 1:
+        for chunk in chunks:
+            yield from render_chunk(chunk)
+        return
+    # chunks are submitted as the deck is indexed and written in slide order as soon as the oldest
+    # one is done. the window keeps every worker busy without rendering far ahead of a slow reader
+    workers = jobs or os.cpu_count() or 1
+    pool = concurrent.futures.ProcessPoolExecutor(workers)
+    pending = collections.deque()
+    try:
+        for chunk in chunks:
+            pending.append(pool.submit(render_chunk, chunk))
+            while pending and (pending[0].done() or len(pending) >= 2 * workers):
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+    finally:
+        # a reader that stops early, like `sli export deck.md | head`, should not wait on the rest
+        pool.shutdown(cancel_futures=True)
+
+def write_export(pages, output_path=None, ansi=False):
+    if output_path is None:
+        try:
+            for index, page in enumerate(pages):
+                if index:
+                    sys.stdout.write(PAGE_BREAK)
+                sys.stdout.write(page)
+                sys.stdout.flush()
+        except BrokenPipeError:
+            pages.close()
+            # stdout is pointed at devnull so that the interpreter does not fail flushing it on exit
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return
+    os.makedirs(output_path, exist_ok=True)
+    extension = 'ans' if ansi else 'txt'
+    for index, page in enumerate(pages):
+        with open(os.path.join(output_path, 'slide-%04d.%s' % (index, extension)), 'w') as fd:
+            fd.write(page)
@@ -0,0 +1,207 @@
+# Copyright (c) 2017, Samantha Marshall (http://pewpewthespells.com)
+# All rights reserved.
+#
+# https://github.com/samdmarshall/sli
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation and/or
+# other materials provided with the distribution.
+#
+# 3. Neither the name of Samantha Marshall nor the names of its contributors may
+# be used to endorse or promote products derived from this software without
+# specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
+# OF THE POSSIBILITY OF SUCH DAMAGE.
+import hashlib
+import threading
+import collections
+import concurrent.futures
+
+DEFAULT_CACHE_SIZE = 512
+# token types are matched along with their subtypes, anything else keeps the plain code colour
+TOKEN_ATTRIBUTES = [
+    ('Comment', 'code.comment'),
+    ('Keyword', 'code.keyword'),
+    ('Literal.String', 'code.string'),
+    ('Literal.Number', 'code.number'),
+    ('Name.Builtin', 'code.builtin'),
+    ('Name.Function', 'code.function'),
+    ('Name.Class', 'code.function'),
+    ('Name.Decorator', 'code.function'),
+]
+
+def load_pygments():
+    try:
+        import pygments.lexers
+        import pygments.token
+        import pygments.util
+    except ImportError:
+        return None
+    return pygments
+
+def code_blocks(slide_contents):
+    # consecutive lines of the same fenced block share a 'code:<language>' kind
+    start = 0
+    while start < len(slide_contents):
+        kind = slide_contents[start][0]
+        end = start + 1
+        while end < len(slide_contents) and slide_contents[end][0] == kind:
+            end += 1
+        if kind.startswith('code:'):
+            yield start, end, kind[len('code:'):]
+        start = end
+
+def block_key(language, slide_contents, start, end):
+    digest = hashlib.sha1(language.encode('utf-8'))
+    for _, segments in slide_contents[start:end]:
+        digest.update(b'\n')
+        for _, text in segments:
+            digest.update(text.encode('utf-8'))
+    return digest.digest()
+
+class CodeHighlighter(object):
+    def __init__(self, cache_size=DEFAULT_CACHE_SIZE):
+        self.cache_size = cache_size
+        self.pygments = None
+        self.loaded = False
+        self.__lexers = dict()
+        self.__attributes = dict()
+        self.__tokens = collections.OrderedDict()
+        self.__queued = set()
+        self.__lock = threading.Lock()
+        self.__worker = None
+
+    def enabled(self):
+        # pygments is optional and only imported once there is something to highlight
+        if not self.loaded:
+            self.pygments = load_pygments()
+            self.loaded = True
+        return self.pygments is not None
+
+    def token_attribute(self, token_type):
+        if token_type not in self.__attributes:
+            attr = 'code'
+            for name, candidate in TOKEN_ATTRIBUTES:
+                if token_type in self.pygments.token.string_to_tokentype(name):
+                    attr = candidate
+                    break
+            self.__attributes[token_type] = attr
+        return self.__attributes[token_type]
+
+    def lexer(self, language):
+        if language not in self.__lexers:
+            try:
+                lexer = self.pygments.lexers.get_lexer_by_name(language, stripnl=False)
+            except self.pygments.util.ClassNotFound:
+                lexer = None
+            self.__lexers[language] = lexer
+        return self.__lexers[language]
+
+    def tokenize(self, language, lines):
+        lexer = self.lexer(language)
+        if lexer is None:
+            return None
+        text = '\n'.join(''.join(text for _, text in segments) for segments in lines)
+        highlighted = [[]]
+        for token_type, value in lexer.get_tokens(text):
+            attr = self.token_attribute(token_type)
+            for index, part in enumerate(value.split('\n')):
+                if index:
+                    highlighted.append([])
+                if part and highlighted[-1] and highlighted[-1][-1][0] == attr:
+                    highlighted[-1][-1] = (attr, highlighted[-1][-1][1] + part)
+                elif part:
+                    highlighted[-1].append((attr, part))
+        # lexers add a trailing newline, the block keeps exactly the lines it had
+        return highlighted[:len(lines)] + [[] for _ in range(len(lines) - len(highlighted))]
+
+    def cached(self, key):
+        with self.__lock:
+            if key in self.__tokens:
+                self.__tokens.move_to_end(key)
+                return self.__tokens[key]
+        return None
+
+    def store(self, key, tokens):
+        with self.__lock:
+            self.__tokens[key] = tokens
+            self.__queued.discard(key)
+            while len(self.__tokens) > self.cache_size:
+                self.__tokens.popitem(last=False)
+
+    def highlight_block(self, language, lines, key):
+        tokens = self.cached(key)
+        if tokens is None:
+            tokens = self.tokenize(language, [segments for _, segments in lines]) or False
+            self.store(key, tokens)
+        return tokens
+
+    def highlight(self, slide_contents):
+        # returns the slide with every cached block highlighted, and the blocks still to tokenize
+        if not self.enabled():
+            return slide_contents, []
+        highlighted = None
+        pending = list()
+        for start, end, language in code_blocks(slide_contents):
+            key = block_key(language, slide_contents, start, end)
+            tokens = self.cached(key)
+            if tokens is None:
+                pending.append((language, slide_contents[start:end], key))
+            elif tokens:
+                if highlighted is None:
+                    highlighted = list(slide_contents)
+                for offset, segments in enumerate(tokens):
+                    highlighted[start + offset] = (slide_contents[start + offset][0], segments)
+        return highlighted or slide_contents, pending
+
+    def highlight_now(self, slide_contents):
+        if not self.enabled():
+            return slide_contents
+        for language, lines, key in self.highlight(slide_contents)[1]:
+            self.highlight_block(language, lines, key)
+        return self.highlight(slide_contents)[0]
+
+    def submit(self, pending, callback=None):
+        with self.__lock:
+            pending = [block for block in pending if block[2] not in self.__queued]
+            self.__queued.update(block[2] for block in pending)
+        if self.__worker is None:
+            self.__worker = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        # blocks another slide already queued come first on the single worker, so even with nothing
+        # new to tokenize the callback runs once they are done
+        future = self.__worker.submit(self.highlight_blocks, pending)
+        if callback is not None:
+            future.add_done_callback(lambda _: callback())
+
+    def highlight_blocks(self, pending):
+        for language, lines, key in pending:
+            self.highlight_block(language, lines, key)
+
+    def prefetch(self, deck, index):
+        if not self.enabled():
+            return
+        if self.__worker is None:
+            self.__worker = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        self.__worker.submit(self.highlight_window, deck, index)
+
+    def highlight_window(self, deck, index):
+        # runs on the worker so that compiling the neighbours happens off the ui thread as well
+        for distance in range(1, deck.prefetch_distance + 1):
+            for neighbor in (index + distance, index - distance):
+                if 0 <= neighbor < len(deck):
+                    self.highlight_blocks(self.highlight(deck[neighbor])[1])
@@ -0,0 +1,170 @@
+# Copyright (c) 2017, Samantha Marshall (http://pewpewthespells.com)
+# All rights reserved.
+#
+# https://github.com/samdmarshall/sli
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation and/or
+# other materials provided with the distribution.
+#
+# 3. Neither the name of Samantha Marshall nor the names of its contributors may
+# be used to endorse or promote products derived from this software without
+# specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
+# OF THE POSSIBILITY OF SUCH DAMAGE.
+import os
+import hashlib
+import threading
+import collections
+import concurrent.futures
+from .cache         import DeckCache, cache_directory
+
+ART_VERSION = 1
+DEFAULT_CACHE_SIZE = 64
+IMAGE_CACHE_LIMIT = 16 * 1024 * 1024
+# bit of each dot in a braille cell, indexed by the dot's row and then column
+BRAILLE_DOTS = ((0x01, 0x08), (0x02, 0x10), (0x04, 0x20), (0x40, 0x80))
+
+def load_pil():
+    try:
+        import PIL.Image
+    except ImportError:
+        return None
+    return PIL.Image
+
+def image_hash(image_path, columns, rows):
+    digest = hashlib.sha256()
+    with open(image_path, 'rb') as fd:
+        for block in iter(lambda: fd.read(1024 * 1024), b''):
+            digest.update(block)
+    return '%s-%dx%d-%d' % (digest.hexdigest(), columns, rows, ART_VERSION)
+
+def braille_art(image_module, image_path, columns, rows):
+    # each character cell is two dots wide and four tall, which keeps dots roughly square
+    image = image_module.open(image_path).convert('L')
+    scale = min(columns * 2.0 / image.width, rows * 4.0 / image.height)
+    width = max(2, int(image.width * scale) // 2 * 2)
+    height = max(4, int(image.height * scale) // 4 * 4)
+    image = image.resize((width, height))
+    pixels = image.tobytes()
+    threshold = sum(pixels) / len(pixels)
+    lines = list()
+    for top in range(0, height, 4):
+        line = list()
+        for left in range(0, width, 2):
+            cell = 0
+            for row, bits in enumerate(BRAILLE_DOTS):
+                offset = (top + row) * width + left
+                for column, bit in enumerate(bits):
+                    if pixels[offset + column] > threshold:
+                        cell |= bit
+            line.append(chr(0x2800 + cell))
+        lines.append(''.join(line))
+    return lines
+
+class ImageRenderer(object):
+    def __init__(self, base_path, cache_size=DEFAULT_CACHE_SIZE, disk_cache=None):
+        self.base_path = base_path
+        self.cache_size = cache_size
+        self.disk_cache = disk_cache
+        self.image_module = None
+        self.loaded = False
+        self.__art = collections.OrderedDict()
+        self.__queued = set()
+        self.__lock = threading.Lock()
+        self.__worker = None
+
+    def enabled(self):
+        # PIL is optional and only imported once a slide has an image on it
+        if not self.loaded:
+            self.image_module = load_pil()
+            self.loaded = True
+        return self.image_module is not None
+
+    def memory_key(self, image_path, columns, rows):
+        try:
+            info = os.stat(image_path)
+        except OSError:
+            return None
+        return (image_path, info.st_mtime_ns, info.st_size, columns, rows)
+
+    def cached(self, key):
+        with self.__lock:
+            if key in self.__art:
+                self.__art.move_to_end(key)
+                return self.__art[key]
+        return None
+
+    def convert(self, image_path, columns, rows, key):
+        # disk entries are keyed by the image contents so renamed or copied images are reused
+        try:
+            disk_key = image_hash(image_path, columns, rows)
+            entry = self.disk_cache.load(disk_key) if self.disk_cache is not None else None
+            if entry is None:
+                entry = {'lines': braille_art(self.image_module, image_path, columns, rows)}
+                if self.disk_cache is not None:
+                    self.disk_cache.store(disk_key, entry)
+            lines = entry['lines']
+        except (OSError, ValueError):
+            lines = False
+        with self.__lock:
+            self.__art[key] = lines
+            self.__queued.discard(key)
+            while len(self.__art) > self.cache_size:
+                self.__art.popitem(last=False)
+
+    def render(self, slide_contents, columns, rows, callback=None):
+        # returns the slide with every converted image in place of its placeholder, images that
+        # still need converting are queued on the worker and callback is run once they are done
+        if not any(kind.startswith('image:') for kind, _ in slide_contents) or not self.enabled():
+            return slide_contents, False
+        rendered = list()
+        pending = False
+        for kind, segments in slide_contents:
+            if not kind.startswith('image:'):
+                rendered.append((kind, segments))
+                continue
+            image_path = os.path.join(self.base_path, os.path.expanduser(kind[len('image:'):]))
+            key = self.memory_key(image_path, columns, rows)
+            lines = self.cached(key) if key is not None else False
+            if lines is None:
+                pending = True
+                self.submit(image_path, columns, rows, key, callback)
+            if not lines:
+                rendered.append((kind, segments))
+                continue
+            rendered.extend((kind, [('image', line)]) for line in lines)
+        return rendered, pending
+
+    def submit(self, image_path, columns, rows, key, callback):
+        with self.__lock:
+            queued = key in self.__queued
+            self.__queued.add(key)
+        if self.__worker is None:
+            self.__worker = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        if queued:
+            # another slide already queued this image, an empty task behind it on the single
+            # worker still runs this slide's callback once the art is ready
+            future = self.__worker.submit(lambda: None)
+        else:
+            future = self.__worker.submit(self.convert, image_path, columns, rows, key)
+        if callback is not None:
+            future.add_done_callback(lambda _: callback())
+
+def image_cache():
+    return DeckCache(os.path.join(cache_directory(), 'images'), IMAGE_CACHE_LIMIT)
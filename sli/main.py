@@ -30,15 +30,39 @@
 # OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
 # OF THE POSSIBILITY OF SUCH DAMAGE.
 
+import os
 import sys
 import argparse
 from switch             import Switch
 from .version           import __version__ as SLI_VERSION
-from .reel              import SlideReel
 from .                  import term
-from .ui                import SizingDisplay, PresentationDisplay, SpeakerNotesDisplay
 from .Logger            import Logger
 
+# each subcommand imports what it needs when it runs, so `sli --version` and `sli size` do not
+# pay for the deck compiler, the caches or the socket stack
+
+def parse_address(value):
+    host, separator, port = value.rpartition(':')
+    if not separator:
+        raise ValueError('expected an address in the form host:port')
+    return (host.strip('[]'), int(port))
+
+def load_slide_deck(args):
+    from .reel          import SlideReel
+    from .cache         import DeckCache
+    deck_cache = None
+    if not args.no_cache:
+        deck_cache = DeckCache()
+    if not args.no_daemon:
+        from .daemon    import attach
+        # a running daemon already has the deck compiled into a bundle, which maps in directly
+        reply = attach(args.presentation, args.daemon)
+        if reply is not None:
+            return SlideReel(reply['bundle'], deck_cache=deck_cache,
+                             base_path=os.path.dirname(reply['deck'])), True
+    return SlideReel(args.presentation, deck_cache=deck_cache, compile_workers=args.jobs,
+                     chunk_size=args.chunk_size), False
+
 def main():
     parser = argparse.ArgumentParser(description='command line markdown presenter')
     parser.add_argument(
@@ -65,6 +89,13 @@ def main():
         default=False,
         action='store_true'
     )
+    parser.add_argument(
+        '--profile',
+        help='Writes a cProfile dump and a JSON timing trace to <prefix>.pstats and <prefix>.json',
+        metavar='prefix',
+        action='store',
+        default=None
+    )
     parser.add_argument(
         '--debug',
         help=argparse.SUPPRESS,
@@ -97,6 +128,60 @@ def main():
         type=int,
         default=0
     )
+    presentation_parser.add_argument(
+        '--no-cache',
+        help='Disables reading and writing the compiled deck cache',
+        default=False,
+        action='store_true'
+    )
+    presentation_parser.add_argument(
+        '--listen',
+        help='Accepts speaker notes connections over TCP on host:port',
+        metavar='host:port',
+        action='store',
+        type=parse_address,
+        default=None
+    )
+    presentation_parser.add_argument(
+        '--watch',
+        help='Reloads slides that change while the presentation file is being edited',
+        default=False,
+        action='store_true'
+    )
+    presentation_parser.add_argument(
+        '--record',
+        help='Appends every slide change to this session log, for use with `sli replay`',
+        metavar='session.log',
+        action='store',
+        default=None
+    )
+    presentation_parser.add_argument(
+        '--jobs',
+        help='Compiles the whole deck up front with this many processes, 0 uses every core',
+        action='store',
+        type=int,
+        default=None
+    )
+    presentation_parser.add_argument(
+        '--chunk-size',
+        help='Number of slides given to each process at a time when using --jobs',
+        action='store',
+        type=int,
+        default=None
+    )
+    presentation_parser.add_argument(
+        '--daemon',
+        help='Opens the deck through the sli daemon listening on this socket',
+        metavar='socket',
+        action='store',
+        default=None
+    )
+    presentation_parser.add_argument(
+        '--no-daemon',
+        help='Loads and compiles the deck in this process even when an sli daemon is running',
+        default=False,
+        action='store_true'
+    )
 
     # Subcommand for running in "speaker notes" mode
     ##
@@ -116,6 +201,198 @@ def main():
         type=int,
         default=0
     )
+    speaker_notes_parser.add_argument(
+        '--connect',
+        help='Connects to a presentation listening over TCP on host:port',
+        metavar='host:port',
+        action='store',
+        type=parse_address,
+        default=None
+    )
+    speaker_notes_parser.add_argument(
+        '--no-cache',
+        help='Disables reading and writing the compiled deck cache',
+        default=False,
+        action='store_true'
+    )
+    speaker_notes_parser.add_argument(
+        '--jobs',
+        help='Compiles the whole deck up front with this many processes, 0 uses every core',
+        action='store',
+        type=int,
+        default=None
+    )
+    speaker_notes_parser.add_argument(
+        '--chunk-size',
+        help='Number of slides given to each process at a time when using --jobs',
+        action='store',
+        type=int,
+        default=None
+    )
+    speaker_notes_parser.add_argument(
+        '--daemon',
+        help='Opens the deck through the sli daemon listening on this socket',
+        metavar='socket',
+        action='store',
+        default=None
+    )
+    speaker_notes_parser.add_argument(
+        '--no-daemon',
+        help='Loads and compiles the deck in this process even when an sli daemon is running',
+        default=False,
+        action='store_true'
+    )
+
+    # Subcommand for running a daemon that keeps decks compiled
+    ##
+    daemon_parser = subparsers.add_parser(
+        'daemon',
+        help='keep decks compiled in the background for `sli present` and `sli notes` to open',
+    )
+    daemon_parser.add_argument(
+        'presentation',
+        metavar='<path to presentation>',
+        nargs='*',
+        action='store',
+    )
+    daemon_parser.add_argument(
+        '--socket',
+        help='Path of the socket the daemon listens on',
+        metavar='socket',
+        action='store',
+        default=None
+    )
+    daemon_parser.add_argument(
+        '--no-cache',
+        help='Disables reading and writing the compiled deck cache',
+        default=False,
+        action='store_true'
+    )
+    daemon_parser.add_argument(
+        '--jobs',
+        help='Number of processes used to compile each deck, 0 uses every core',
+        action='store',
+        type=int,
+        default=0
+    )
+
+    # Subcommand for replaying a recorded session into a running presentation
+    ##
+    replay_parser = subparsers.add_parser(
+        'replay',
+        help='replay a session log recorded with `sli present --record` into a presentation',
+    )
+    replay_parser.add_argument(
+        'log',
+        metavar='<path to session log>',
+        action='store',
+    )
+    replay_parser.add_argument(
+        '--connect',
+        help='Connects to a presentation listening over TCP on host:port',
+        metavar='host:port',
+        action='store',
+        type=parse_address,
+        default=None
+    )
+    replay_parser.add_argument(
+        '--speed',
+        help='Playback speed relative to the recording, 0 replays as fast as possible',
+        action='store',
+        type=float,
+        default=1.0
+    )
+    replay_parser.add_argument(
+        '--max-gap',
+        help='Longest pause in seconds to keep between two recorded slide changes',
+        action='store',
+        type=float,
+        default=60.0
+    )
+
+    # Subcommand for compiling a presentation into a memory mappable bundle
+    ##
+    compile_parser = subparsers.add_parser(
+        'compile',
+        help='precompile a presentation into a bundle that present and notes can open directly',
+    )
+    compile_parser.add_argument(
+        'presentation',
+        metavar='<path to presentation>',
+        action='store',
+    )
+    compile_parser.add_argument(
+        '-o', '--output',
+        help='Path to write the bundle to, defaults to the presentation path ending in .sli',
+        action='store',
+        default=None
+    )
+    compile_parser.add_argument(
+        '--jobs',
+        help='Compiles with this many processes, 0 uses every core',
+        action='store',
+        type=int,
+        default=None
+    )
+    compile_parser.add_argument(
+        '--chunk-size',
+        help='Number of slides given to each process at a time when using --jobs',
+        action='store',
+        type=int,
+        default=None
+    )
+
+    # Subcommand for exporting rendered slides without a terminal
+    ##
+    export_parser = subparsers.add_parser(
+        'export',
+        help='render every slide to text or ANSI files, or to stdout',
+    )
+    export_parser.add_argument(
+        'presentation',
+        metavar='<path to presentation>',
+        action='store',
+    )
+    export_parser.add_argument(
+        '--notes',
+        help='Exports the speaker notes view instead of the presentation view',
+        default=False,
+        action='store_true'
+    )
+    export_parser.add_argument(
+        '--ansi',
+        help='Keeps the slide styling as ANSI escape codes',
+        default=False,
+        action='store_true'
+    )
+    export_parser.add_argument(
+        '--width',
+        help='Number of columns to lay the slides out in',
+        action='store',
+        type=int,
+        default=80
+    )
+    export_parser.add_argument(
+        '--output',
+        help='Writes one file per slide into this directory instead of streaming to stdout',
+        metavar='directory',
+        action='store',
+        default=None
+    )
+    export_parser.add_argument(
+        '--jobs',
+        help='Number of processes to render with, 0 uses every core and 1 renders in process',
+        action='store',
+        type=int,
+        default=0
+    )
+    export_parser.add_argument(
+        '--chunk-size',
+        help='Number of slides given to each process at a time',
+        action='store',
+        type=int,
+        default=None
+    )
 
     # Subcommand for running in "sizing" mode
     ##
@@ -130,17 +407,85 @@ def main():
     Logger.enableDebugLogger(args.debug)
     Logger.isVerbose(args.verbose)
     Logger.isSilent(args.quiet)
+    if args.profile is not None:
+        from .timing    import Profiler
+        Profiler.enable(args.profile)
 
     with Switch(args.command) as case:
         if case('present'):
-            slide_deck = SlideReel(args.presentation)
-            presentation = PresentationDisplay(slide_deck, args.slide)
+            from .ui    import PresentationDisplay
+            slide_deck, attached = load_slide_deck(args)
+            presentation = PresentationDisplay(slide_deck, args.slide, address=args.listen)
+            if args.record is not None:
+                from .record import SessionLog
+                presentation.agent.recorder = SessionLog(args.record)
+            # the daemon rewrites its bundle whenever the deck changes, so attached decks follow it
+            if args.watch or attached:
+                from .watch import FileWatcher
+                FileWatcher(slide_deck.pres_path, presentation.reload_deck).start()
             presentation.run()
         if case('notes'):
-            slide_deck = SlideReel(args.presentation)
-            presentation = SpeakerNotesDisplay(slide_deck, args.slide)
+            from .ui    import SpeakerNotesDisplay
+            slide_deck, _ = load_slide_deck(args)
+            presentation = SpeakerNotesDisplay(slide_deck, args.slide, address=args.connect)
             presentation.run()
+        if case('daemon'):
+            import asyncio
+            from .daemon import DeckDaemon
+            from .cache import DeckCache
+            deck_cache = None if args.no_cache else DeckCache()
+            daemon = DeckDaemon(args.socket, deck_cache=deck_cache, compile_workers=args.jobs)
+            try:
+                asyncio.run(daemon.serve(args.presentation))
+            except KeyboardInterrupt:
+                pass
+            except OSError as error:
+                Logger.write().error('Unable to start the sli daemon: %s' % error)
+                parser.exit(1, '')
+        if case('replay'):
+            import asyncio
+            from .agent import Client
+            from .record import read_session, replay_session
+            try:
+                events = read_session(args.log)
+                result = asyncio.run(replay_session(Client(args.connect), events, args.speed,
+                                                    args.max_gap))
+            except (OSError, ValueError, asyncio.TimeoutError) as error:
+                reason = str(error) or 'timed out'
+                Logger.write().error('Unable to replay the session: %s' % reason)
+                parser.exit(1, '')
+            Logger.write().info('Replayed %d slide changes in %.3f s, %.0f per second' % (
+                result['events'], result['elapsed_s'], result['events_per_s']))
+            if not result['acknowledged']:
+                Logger.write().warning('The presentation did not acknowledge every change')
+        if case('compile'):
+            from .reel  import SlideReel
+            if not os.path.exists(os.path.expanduser(args.presentation)):
+                Logger.write().error('Unable to compile the presentation: %s does not exist' %
+                                     args.presentation)
+                parser.exit(1, '')
+            slide_deck = SlideReel(args.presentation, compile_workers=args.jobs,
+                                   chunk_size=args.chunk_size)
+            output_path = args.output
+            if output_path is None:
+                output_path = os.path.splitext(slide_deck.pres_path)[0] + '.sli'
+            try:
+                slide_deck.write_bundle(output_path)
+            except (OSError, ValueError) as error:
+                Logger.write().error('Unable to compile the presentation: %s' % error)
+                parser.exit(1, '')
+        if case('export'):
+            from .reel  import SlideReel
+            from .export import export_deck, write_export
+            if not os.path.exists(os.path.expanduser(args.presentation)):
+                Logger.write().error('Unable to export the presentation: %s does not exist' %
+                                     args.presentation)
+                parser.exit(1, '')
+            pages = export_deck(SlideReel(args.presentation), args.notes, args.width, args.ansi,
+                                args.jobs, args.chunk_size)
+            write_export(pages, args.output, args.ansi)
         if case('size'):
+            from .ui    import SizingDisplay
             sizing_display = SizingDisplay()
             sizing_display.run()
 
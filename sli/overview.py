@@ -0,0 +1,131 @@
+# Copyright (c) 2017, Samantha Marshall (http://pewpewthespells.com)
+# All rights reserved.
+#
+# https://github.com/samdmarshall/sli
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation and/or
+# other materials provided with the distribution.
+#
+# 3. Neither the name of Samantha Marshall nor the names of its contributors may
+# be used to endorse or promote products derived from this software without
+# specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
+# OF THE POSSIBILITY OF SUCH DAMAGE.
+import urwid
+
+CELL_WIDTH = 26
+THUMBNAIL_LINES = 4
+
+def thumbnail(slide_contents, line_count=THUMBNAIL_LINES):
+    lines = list()
+    for kind, segments in slide_contents:
+        if kind != 'note' and ''.join(text for _, text in segments).strip():
+            lines.append(segments)
+        if len(lines) == line_count:
+            break
+    return lines
+
+def clip_line(segments, width):
+    markup = list()
+    for attr, text in segments:
+        text = text[:width]
+        width -= len(text)
+        markup.append(text if attr is None else (attr, text))
+    markup.append(' ' * width)
+    return markup
+
+def draw_cell(index, lines, selected):
+    # cells are drawn as a single text widget, nesting a LineBox per cell makes scrolling sluggish
+    border = 'selected' if selected else None
+    inner = CELL_WIDTH - 2
+    title = (' %d ' % index).center(inner, '─')
+    markup = [(border, '┌' + title + '┐\n')]
+    for line in range(THUMBNAIL_LINES):
+        segments = lines[line] if line < len(lines) else list()
+        markup.append((border, '│'))
+        markup.extend(clip_line(segments, inner))
+        markup.append((border, '│\n'))
+    markup.append((border, '└' + '─' * inner + '┘'))
+    return urwid.Text(markup, wrap='clip').render((CELL_WIDTH,))
+
+class OverviewGrid(urwid.Widget):
+    _sizing = frozenset(['box'])
+
+    def __init__(self, deck):
+        super().__init__()
+        self.deck = deck
+        self.selected = 0
+        self.top_row = 0
+        self.columns = 1
+        self.visible_rows = 1
+        # thumbnails are keyed by slide source hash so that they survive reloading the deck
+        self.thumbnails = dict()
+        self.cells = dict()
+
+    def thumbnail(self, index):
+        key = self.deck.hashes[index]
+        if key not in self.thumbnails:
+            self.thumbnails[key] = thumbnail(self.deck[index])
+        return self.thumbnails[key]
+
+    def select(self, index):
+        self.selected = max(0, min(len(self.deck) - 1, index))
+        self._invalidate()
+
+    def move(self, rows=0, columns=0):
+        self.select(self.selected + rows * self.columns + columns)
+
+    def page(self, direction):
+        self.move(rows=direction * self.visible_rows)
+
+    def cell(self, index):
+        key = (self.deck.hashes[index], index, index == self.selected)
+        if key not in self.cells:
+            self.cells[key] = draw_cell(index, self.thumbnail(index), index == self.selected)
+        return self.cells[key]
+
+    def render(self, size, focus=False):
+        cols, rows = size
+        self.columns = max(1, cols // CELL_WIDTH)
+        self.visible_rows = max(1, rows // (THUMBNAIL_LINES + 2))
+        selected_row = self.selected // self.columns
+        if selected_row < self.top_row:
+            self.top_row = selected_row
+        elif selected_row >= self.top_row + self.visible_rows:
+            self.top_row = selected_row - self.visible_rows + 1
+        # only the slides in the visible rows are ever thumbnailed or drawn
+        previous, self.cells = self.cells, dict()
+        grid = list()
+        first = self.top_row * self.columns
+        for row_start in range(first, first + self.visible_rows * self.columns, self.columns):
+            row = list()
+            for index in range(row_start, min(row_start + self.columns, len(self.deck))):
+                key = (self.deck.hashes[index], index, index == self.selected)
+                if key in previous:
+                    self.cells[key] = previous[key]
+                row.append((self.cell(index), None, False, CELL_WIDTH))
+            if not row:
+                break
+            grid.append((urwid.CanvasJoin(row), None, False))
+        if not grid:
+            return urwid.SolidCanvas(' ', cols, rows)
+        canvas = urwid.CanvasCombine(grid)
+        canvas.pad_trim_left_right(0, cols - canvas.cols())
+        canvas.pad_trim_top_bottom(0, rows - canvas.rows())
+        return canvas
@@ -0,0 +1,54 @@
+# Copyright (c) 2017, Samantha Marshall (http://pewpewthespells.com)
+# All rights reserved.
+#
+# https://github.com/samdmarshall/sli
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation and/or
+# other materials provided with the distribution.
+#
+# 3. Neither the name of Samantha Marshall nor the names of its contributors may
+# be used to endorse or promote products derived from this software without
+# specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
+# OF THE POSSIBILITY OF SUCH DAMAGE.
+
+# urwid display attributes for the segment names the slide compiler emits
+PALETTE = [
+    ('h1', 'default,bold,underline', 'default'),
+    ('h2', 'default,bold', 'default'),
+    ('h3', 'default,underline', 'default'),
+    ('strong', 'default,bold', 'default'),
+    ('emphasis', 'default,italics', 'default'),
+    ('strong.emphasis', 'default,bold,italics', 'default'),
+    ('code', 'light green', 'default'),
+    ('link', 'light blue,underline', 'default'),
+    ('image', 'light magenta', 'default'),
+    ('quote', 'dark cyan', 'default'),
+    ('quote.strong', 'dark cyan,bold', 'default'),
+    ('quote.emphasis', 'dark cyan,italics', 'default'),
+    ('quote.strong.emphasis', 'dark cyan,bold,italics', 'default'),
+    ('bullet', 'yellow', 'default'),
+    ('selected', 'standout', 'default'),
+    ('code.comment', 'dark gray', 'default'),
+    ('code.keyword', 'light magenta', 'default'),
+    ('code.string', 'brown', 'default'),
+    ('code.number', 'light cyan', 'default'),
+    ('code.builtin', 'dark cyan', 'default'),
+    ('code.function', 'light blue', 'default'),
+]
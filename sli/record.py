@@ -0,0 +1,103 @@
+# Copyright (c) 2017, Samantha Marshall (http://pewpewthespells.com)
+# All rights reserved.
+#
+# https://github.com/samdmarshall/sli
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation and/or
+# other materials provided with the distribution.
+#
+# 3. Neither the name of Samantha Marshall nor the names of its contributors may
+# be used to endorse or promote products derived from this software without
+# specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
+# OF THE POSSIBILITY OF SUCH DAMAGE.
+import os
+import time
+import struct
+import asyncio
+
+LOG_MAGIC = b'SLIR'
+LOG_VERSION = 1
+LOG_HEADER = struct.Struct('!4sB')
+# wall clock time, sequence number and slide index of each slide change
+LOG_RECORD = struct.Struct('!dIi')
+CONNECT_TIMEOUT = 5.0
+ECHO_TIMEOUT = 10.0
+
+class SessionLog(object):
+    def __init__(self, log_path):
+        self.log_path = os.path.expanduser(log_path)
+        # records are only ever appended, each one in a single write so a crash loses at most one
+        self.fd = open(self.log_path, 'ab', buffering=0)
+        if self.fd.tell() == 0:
+            self.fd.write(LOG_HEADER.pack(LOG_MAGIC, LOG_VERSION))
+
+    def append(self, timestamp, sequence, slide):
+        self.fd.write(LOG_RECORD.pack(timestamp, sequence, slide))
+
+    def close(self):
+        self.fd.close()
+
+def read_session(log_path):
+    with open(os.path.expanduser(log_path), 'rb') as fd:
+        data = fd.read()
+    if len(data) < LOG_HEADER.size:
+        raise ValueError('%s is not a session log' % log_path)
+    magic, version = LOG_HEADER.unpack_from(data, 0)
+    if magic != LOG_MAGIC or version != LOG_VERSION:
+        raise ValueError('%s is not a supported session log' % log_path)
+    # a record cut short by a crash is left off
+    end = LOG_HEADER.size + (len(data) - LOG_HEADER.size) // LOG_RECORD.size * LOG_RECORD.size
+    return list(LOG_RECORD.iter_unpack(data[LOG_HEADER.size:end]))
+
+def replay_delays(events, speed, max_gap):
+    # a sequence number going backwards is the start of another recording appended to the log,
+    # the pause between two recordings is not part of either
+    previous = None
+    for timestamp, sequence, slide in events:
+        delay = 0.0
+        if speed and previous is not None and sequence > previous[1]:
+            delay = min(max(0.0, timestamp - previous[0]), max_gap) / speed
+        previous = (timestamp, sequence)
+        yield delay, slide
+
+async def replay_session(client, events, speed=1.0, max_gap=60.0):
+    client.loop = asyncio.get_running_loop()
+    await asyncio.wait_for(client.open(), CONNECT_TIMEOUT)
+    started = time.perf_counter()
+    for delay, slide in replay_delays(events, speed, max_gap):
+        # yielding even without a delay lets the outbox flush, at full speed it still coalesces
+        # changes that arrive faster than the socket takes them, just as a presenter would
+        await asyncio.sleep(delay)
+        client.send_data({'slide': slide}, 'slide')
+    sent = time.perf_counter() - started
+    # the run is over once the presenter has echoed back the last change
+    deadline = time.perf_counter() + ECHO_TIMEOUT
+    while client.acknowledged < client.local_sequence and time.perf_counter() < deadline:
+        await asyncio.sleep(0.001)
+    elapsed = time.perf_counter() - started
+    client.close()
+    await asyncio.sleep(0)
+    return {
+        'events': len(events),
+        'sent_s': sent,
+        'elapsed_s': elapsed,
+        'events_per_s': len(events) / elapsed if elapsed else 0.0,
+        'acknowledged': client.acknowledged >= client.local_sequence,
+    }
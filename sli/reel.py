@@ -30,23 +30,309 @@
 
 import os
 import re
-import markdown
+import time
+import mmap
+import hashlib
+import functools
+import threading
+import collections
+import concurrent.futures
+from .bundle        import SlideBundle, BUNDLE_MAGIC, is_bundle, write_bundle
+from .cache         import deck_hash
+from .render        import compile_slide
+from .search        import SlideIndex
+from .store         import SlideBounds, SlideHashes, CompiledSlides, encode_slide
+from .timing        import Profiler
+
+SLIDE_SEPARATOR = re.compile(rb'\n(\-|\*){3,}')
+DEFAULT_CHUNK_SIZE = 64
+
+def compile_records(page_texts, compress=False):
+    # workers hand back encoded slides, which pickle far smaller than the nested lists
+    return [encode_slide(compile_slide(page_text), compress) for page_text in page_texts]
+
+def load_deck(file_path):
+    # only bundles stay mapped, they are always swapped in with os.replace. a markdown deck can be
+    # rewritten in place while it is open, and reading a mapping that was truncated under it faults
+    with open(file_path, 'rb') as fd:
+        head = fd.read(len(BUNDLE_MAGIC))
+        if not is_bundle(head):
+            return head + fd.read()
+        return mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+
+def scan_slides(data):
+    data_index = 0
+    for item in SLIDE_SEPARATOR.finditer(data):
+        yield (data_index, item.start(0))
+        data_index = item.end(0)
+    if data[data_index:].strip():
+        yield (data_index, len(data))
+
+def hash_slide(data, start, end):
+    return hashlib.sha1(memoryview(data)[start:end]).digest()
 
 class SlideReel(object):
-    def __init__(self, file_path):
+    def __init__(self, file_path, cache_size=64, prefetch_distance=1, deck_cache=None,
+                 compile_workers=None, chunk_size=DEFAULT_CHUNK_SIZE, compress=False,
+                 base_path=None):
         self.pres_path = os.path.expanduser(file_path)
+        # images and other relative paths in slides resolve against the deck's own directory
+        self.base_path = os.path.dirname(self.pres_path) if base_path is None else base_path
+        self.load_started = time.perf_counter()
         self.current_index = 0
-        self.slides = list()
+        self.bounds = SlideBounds()
+        self.hashes = SlideHashes()
+        self.indexed = threading.Event()
+        self.cache_size = max(cache_size, 2 * prefetch_distance + 1)
+        self.prefetch_distance = prefetch_distance
+        self.deck_cache = deck_cache
+        self.compile_workers = compile_workers
+        self.chunk_size = max(1, chunk_size or DEFAULT_CHUNK_SIZE)
+        self.compress = compress
+        self.deck_hash = None
+        self.__data = b''
+        self.__precompiled = None
+        self.__search_index = None
+        self.__compiled = collections.OrderedDict()
+        # bumped by every reload, slides compiled from an older source are not cached
+        self.__generation = 0
+        self.__lock = threading.Lock()
+        self.__found = threading.Condition()
+        self.__compiling = threading.Lock()
+        self.__searching = threading.Lock()
+        self.__prefetcher = None
+
+        if not os.path.exists(self.pres_path):
+            self.indexed.set()
+            return
+
+        self.__data = load_deck(self.pres_path)
+        if is_bundle(self.__data):
+            # a compiled bundle already carries its index, nothing needs to be scanned
+            self.open_bundle(SlideBundle(self.__data))
+            self.finish_indexing()
+            return
+
+        # slide boundaries are found in the background, the first slides are usable as soon as
+        # their separators have been scanned and compiling only happens on first access
+        threading.Thread(target=self.index_slides, daemon=True).start()
+
+    def __len__(self):
+        return len(self.bounds)
+
+    def __getitem__(self, index):
+        return self.slide(index)
+
+    def add_bound(self, start, end):
+        with self.__found:
+            self.bounds.append((start, end))
+            self.hashes.append(hash_slide(self.__data, start, end))
+            self.__found.notify_all()
+
+    def finish_indexing(self):
+        Profiler.record('deck.load', time.perf_counter() - self.load_started)
+        with self.__found:
+            self.indexed.set()
+            self.__found.notify_all()
+
+    def open_bundle(self, bundle):
+        self.bounds = bundle.bounds
+        self.hashes = bundle.hashes
+        if bundle.current:
+            self.deck_hash = bundle.deck_hash
+            self.__precompiled = bundle.slides
+        else:
+            # bundles from another compiler still carry the source, so those slides compile lazily
+            self.deck_hash = deck_hash(bundle.source())
+
+    def index_slides(self):
+        if self.deck_cache is not None:
+            self.deck_hash = deck_hash(self.__data)
+            entry = self.deck_cache.load(self.deck_hash)
+            if entry is not None:
+                self.__precompiled = CompiledSlides.load(entry['slides'])
+                if 'index' in entry:
+                    self.__search_index = SlideIndex.load(entry['index'])
+                for start, end in SlideBounds.load(entry['bounds']):
+                    self.add_bound(start, end)
+                self.finish_indexing()
+                return
+
+        for start, end in scan_slides(self.__data):
+            self.add_bound(start, end)
+        self.finish_indexing()
+
+        if self.deck_hash is None:
+            self.deck_hash = deck_hash(self.__data)
+        if self.deck_cache is not None or self.compile_workers is not None:
+            self.compile_all()
+
+    def has_slide(self, index):
+        with self.__found:
+            while index >= len(self.bounds) and not self.indexed.is_set():
+                self.__found.wait()
+        return 0 <= index < len(self.bounds)
+
+    def source(self, index):
+        # a reload swaps the data and bounds together, so both are read from the same source
+        with self.__lock:
+            data = self.__data
+            start, end = self.bounds[index]
+        return data[start:end].decode('utf-8')
+
+    def is_compiled(self, index):
+        with self.__lock:
+            return index in self.__compiled
+
+    def slide(self, index):
+        if index < 0:
+            self.indexed.wait()
+            index += len(self)
+        if not self.has_slide(index):
+            raise IndexError('slide index out of range')
+        if self.__precompiled is not None:
+            return self.__precompiled[index]
+        with self.__lock:
+            if index in self.__compiled:
+                self.__compiled.move_to_end(index)
+                return self.__compiled[index]
+            generation = self.__generation
+        with Profiler.timed('slide.compile'):
+            contents = compile_slide(self.source(index))
+        with self.__lock:
+            if generation != self.__generation:
+                return contents
+            self.__compiled[index] = contents
+            self.__compiled.move_to_end(index)
+            while len(self.__compiled) > self.cache_size:
+                self.__compiled.popitem(last=False)
+        return contents
+
+    def compile_all(self):
+        with self.__compiling:
+            if self.__precompiled is not None:
+                return self.__precompiled
+            self.indexed.wait()
+            slides = CompiledSlides(compress=self.compress)
+            if self.compile_workers is None:
+                for index in range(len(self)):
+                    slides.append(compile_slide(self.source(index)))
+            else:
+                # executor.map hands results back in submission order, so chunking keeps slide order
+                chunks = list()
+                for start in range(0, len(self), self.chunk_size):
+                    end = min(start + self.chunk_size, len(self))
+                    chunks.append([self.source(index) for index in range(start, end)])
+                compile_chunk = functools.partial(compile_records, compress=self.compress)
+                with concurrent.futures.ProcessPoolExecutor(self.compile_workers or None) as pool:
+                    for records in pool.map(compile_chunk, chunks):
+                        for data, body_length in records:
+                            slides.append_record(data, body_length)
+            self.__precompiled = slides
+            if self.deck_cache is not None:
+                self.store_entry(slides)
+        return slides
+
+    def write_bundle(self, output_path):
+        self.indexed.wait()
+        if is_bundle(self.__data):
+            raise ValueError('%s is already a compiled bundle' % self.pres_path)
+        slides = self.compile_all()
+        records = (slides.encoded(index) for index in range(len(slides)))
+        write_bundle(output_path, self.__data, self.bounds, self.hashes, records)
+
+    def store_entry(self, slides):
+        entry = {'bounds': self.bounds.dump(), 'slides': slides.dump(),
+                 'index': self.search_index().dump()}
+        self.deck_cache.store(self.deck_hash, entry)
+
+    def search_index(self):
+        self.indexed.wait()
+        with self.__searching:
+            if self.__search_index is None:
+                texts = (self.source(index) for index in range(len(self)))
+                self.__search_index = SlideIndex.build(texts)
+            return self.__search_index
 
-        if not os.path.exists(self.pres_path): return
+    def reload(self, changed=None):
+        self.indexed.wait()
+        try:
+            data = load_deck(self.pres_path)
+        except OSError:
+            # editors that save by renaming can briefly leave no file behind
+            return None
+        if is_bundle(data):
+            return self.reload_bundle(SlideBundle(data))
+        bounds = SlideBounds(scan_slides(data))
+        hashes = SlideHashes(hash_slide(data, start, end) for start, end in bounds)
+        with self.__compiling:
+            compress = self.compress
+            with self.__lock:
+                # precompiled slides are carried over still encoded, the rest as compiled contents
+                if isinstance(self.__precompiled, CompiledSlides):
+                    compress = self.__precompiled.compress
+                    compiled = [(index, self.__precompiled.record(index))
+                                for index in range(len(self.__precompiled))]
+                elif self.__precompiled is not None:
+                    compiled = [(index, encode_slide(contents, compress))
+                                for index, contents in enumerate(self.__precompiled)]
+                else:
+                    compiled = list(self.__compiled.items())
+            if changed is None:
+                changed = [index for index, value in enumerate(hashes)
+                           if index >= len(self.hashes) or self.hashes[index] != value]
+                changed.extend(range(len(hashes), len(self.hashes)))
+                # compiled slides are matched up by source hash so that moved slides are reused
+                reusable = dict((self.hashes[index], contents) for index, contents in compiled)
+                kept = dict((index, reusable[value]) for index, value in enumerate(hashes)
+                            if value in reusable)
+            else:
+                stale = set(changed)
+                kept = dict((index, contents) for index, contents in compiled
+                            if index not in stale and index < len(bounds))
+            precompiled = None
+            if self.__precompiled is not None:
+                precompiled = CompiledSlides(compress=compress)
+                for index, (start, end) in enumerate(bounds):
+                    if index in kept:
+                        precompiled.append_record(*kept[index])
+                    else:
+                        precompiled.append(compile_slide(data[start:end].decode('utf-8')))
+                kept = dict()
+            with self.__lock, self.__found, self.__searching:
+                self.__data = data
+                self.bounds = bounds
+                self.hashes = hashes
+                self.deck_hash = deck_hash(data)
+                self.__precompiled = precompiled
+                self.__search_index = None
+                self.__generation += 1
+                nearest = sorted(kept.items(), key=lambda item: -abs(item[0] - self.current_index))
+                self.__compiled = collections.OrderedDict(nearest[-self.cache_size:])
+            if precompiled is not None and self.deck_cache is not None:
+                self.store_entry(precompiled)
+        return changed
 
-        fd = open(self.pres_path, 'r')
-        data = fd.read()
-        fd.close()
+    def reload_bundle(self, bundle):
+        changed = [index for index in range(bundle.count)
+                   if index >= len(self.hashes) or self.hashes[index] != bundle.hashes[index]]
+        changed.extend(range(bundle.count, len(self.hashes)))
+        with self.__compiling, self.__lock, self.__found, self.__searching:
+            self.__data = bundle.data
+            self.__precompiled = None
+            self.__search_index = None
+            self.__compiled = collections.OrderedDict()
+            self.__generation += 1
+            self.open_bundle(bundle)
+        return changed
 
-        results = re.finditer(r'\n(\-|\*){3,}', data)
-        data_index = 0
-        for item in results:
-            page_text = data[data_index:item.start(0)]
-            data_index = item.end(0)
-            self.slides.append(markdown.markdown(page_text))
+    def prefetch(self, index):
+        self.current_index = index
+        if self.__precompiled is not None:
+            return
+        if self.__prefetcher is None:
+            self.__prefetcher = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        for distance in range(1, self.prefetch_distance + 1):
+            for neighbor in (index + distance, index - distance):
+                if 0 <= neighbor < len(self) and not self.is_compiled(neighbor):
+                    self.__prefetcher.submit(self.slide, neighbor)
@@ -28,33 +28,166 @@
 # OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
 # OF THE POSSIBILITY OF SUCH DAMAGE.
 
-from switch         import Switch
-from html.parser    import HTMLParser
+import re
+import html
 
-class SlideDisplay(HTMLParser):
+COMPILER_VERSION = 4
 
-    def reset_lines(self):
-        self.lines = list()
+HEADING = re.compile(r'(#{1,6})\s+(.*?)(\s+#+)?\s*$')
+FENCE = re.compile(r'\s*(`{3,}|~{3,})\s*([\w+#.-]*)')
+LIST_ITEM = re.compile(r'(\s*)([-*+]|\d+[.)])\s+(.*)$')
+QUOTE = re.compile(r'\s*>\s?(.*)$')
+SETEXT_UNDERLINE = re.compile(r'\s*(=+|-+)\s*$')
+IMAGE_LINE = re.compile(r'\s*!\[([^\]]*)\]\(([^)\s]+)(\s+"[^"]*")?\)\s*$')
+INLINE = re.compile(
+    r'(?P<code_fence>`+)(?P<code>.+?)(?P=code_fence)'
+    r'|!\[(?P<image>[^\]]*)\]\([^)]*\)'
+    r'|\[(?P<link>[^\]]+)\]\([^)]*\)'
+    r'|\*\*(?P<strong_star>(?!\s).+?)(?<!\s)\*\*(?!\*)'
+    r'|(?<!\w)__(?P<strong_line>(?!\s).+?)(?<!\s)__(?!\w)'
+    r'|\*(?P<emphasis_star>(?!\s).+?)(?<!\s)\*'
+    r'|(?<!\w)_(?P<emphasis_line>(?!\s).+?)(?<!\s)_(?!\w)'
+    r'|\\(?P<escape>[\\`*_{}\[\]()#+\-.!%>])'
+    r'|<(?P<html_tag>b|strong|i|em|code)>(?P<html>.*?)</(?P=html_tag)>'
+    r'|(?P<tag><!--.*?-->|</?[A-Za-z][A-Za-z0-9-]*(\s[^<>]*)?/?>)'
+)
+HTML_ATTRIBUTES = {'b': 'strong', 'strong': 'strong', 'i': 'emphasis', 'em': 'emphasis',
+                   'code': 'code'}
+# emphasis inside bold or quoted text keeps both, anything else nested takes the outer attribute
+NESTED_ATTRIBUTES = {
+    ('strong', 'emphasis'): 'strong.emphasis',
+    ('emphasis', 'strong'): 'strong.emphasis',
+    ('quote', 'strong'): 'quote.strong',
+    ('quote', 'emphasis'): 'quote.emphasis',
+    ('quote.strong', 'emphasis'): 'quote.strong.emphasis',
+    ('quote.emphasis', 'strong'): 'quote.strong.emphasis',
+}
 
-    def set_display_driver(self, text_widget):
-        self.text_field = text_widget
+def nested_attr(outer, inner):
+    if outer is None:
+        return inner
+    return NESTED_ATTRIBUTES.get((outer, inner), outer)
+
+def compile_inline(text, attr=None):
+    segments = list()
+    text_index = 0
+    for item in INLINE.finditer(text):
+        if item.start(0) > text_index:
+            segments.append((attr, html.unescape(text[text_index:item.start(0)])))
+        text_index = item.end(0)
+        group = item.lastgroup
+        if group == 'code':
+            segments.append(('code', item.group('code')))
+        elif group == 'image':
+            segments.append(('image', '[' + (item.group('image') or 'image') + ']'))
+        elif group == 'link':
+            segments.append(('link', item.group('link')))
+        elif group == 'escape':
+            segments.append((attr, item.group('escape')))
+        elif group == 'tag':
+            # markup without a terminal equivalent is dropped, as the html renderer used to
+            continue
+        elif group == 'html' and item.group('html_tag') == 'code':
+            segments.append(('code', html.unescape(item.group('html'))))
+        elif group == 'html':
+            inner = HTML_ATTRIBUTES[item.group('html_tag')]
+            segments.extend(compile_inline(item.group('html'), nested_attr(attr, inner)))
+        elif group.startswith('strong'):
+            segments.extend(compile_inline(item.group(group), nested_attr(attr, 'strong')))
+        else:
+            segments.extend(compile_inline(item.group(group), nested_attr(attr, 'emphasis')))
+    if text_index < len(text):
+        segments.append((attr, html.unescape(text[text_index:])))
+    return segments
+
+def compile_slide(page_text):
+    # a single pass over the slide source producing one (kind, segments) entry per display line,
+    # where segments are (attribute, text) pairs that map directly onto urwid text markup
+    lines = list()
+    fence = None
+    code_kind = 'code'
+    previous_blank = True
+    # the source of the last plain paragraph line, an underline of = or - turns it into a heading
+    paragraph = None
+    for line in page_text.split('\n'):
+        if fence is not None:
+            if line.strip().startswith(fence):
+                fence = None
+            else:
+                lines.append((code_kind, [('code', line)]))
+            continue
+        if not line.strip():
+            if not previous_blank:
+                lines.append(('body', []))
+            previous_blank = True
+            paragraph = None
+            continue
+        underline = SETEXT_UNDERLINE.match(line)
+        if underline is not None and paragraph is not None:
+            level = 1 if underline.group(1)[0] == '=' else 2
+            lines[-1] = ('body', compile_inline(paragraph, 'h%d' % level))
+            paragraph = None
+            continue
+        paragraph = None
+        fence_match = FENCE.match(line)
+        if fence_match is not None:
+            fence = fence_match.group(1)
+            # fenced lines keep the info string language in their kind so they can be highlighted
+            code_kind = 'code:' + fence_match.group(2) if fence_match.group(2) else 'code'
+            previous_blank = False
+            continue
+        if line.lstrip().startswith('%'):
+            lines.append(('note', compile_inline(line.lstrip()[1:].strip())))
+            previous_blank = False
+            continue
+        if previous_blank and (line.startswith('    ') or line.startswith('\t')):
+            lines.append(('code', [('code', line[4:] if line.startswith('    ') else line[1:])]))
+            continue
+        previous_blank = False
+        image = IMAGE_LINE.match(line)
+        if image is not None:
+            # images on a line of their own keep their path in the kind so they can be drawn
+            placeholder = '[' + (image.group(1) or 'image') + ']'
+            lines.append(('image:' + image.group(2), [('image', placeholder)]))
+            continue
+        heading = HEADING.match(line)
+        if heading is not None:
+            level = min(len(heading.group(1)), 3)
+            lines.append(('body', compile_inline(heading.group(2), 'h%d' % level)))
+            continue
+        list_item = LIST_ITEM.match(line)
+        if list_item is not None:
+            indent, marker, text = list_item.groups()
+            bullet = marker if marker[0].isdigit() else '•'
+            segments = [('bullet', indent + bullet + ' ')] + compile_inline(text)
+            lines.append(('body', segments))
+            continue
+        quote = QUOTE.match(line)
+        if quote is not None:
+            lines.append(('body', [('quote', '│ ')] + compile_inline(quote.group(1), 'quote')))
+            continue
+        paragraph = line.strip()
+        lines.append(('body', compile_inline(paragraph)))
+    while lines and lines[-1] == ('body', []):
+        lines.pop()
+    return lines
+
+class SlideDisplay(object):
+    def __init__(self):
+        self.show_notes = False
 
     def set_presenter_notes(self, boolean):
         self.show_notes = boolean
 
-    def handle_starttag(self, tag, attrs):
-        with Switch(tag) as case:
-            pass
-        self.last_start_tag = tag
-
-    def handle_endtag(self, tag):
-        with Switch(tag) as case:
-            pass
-        self.last_end_tag = tag
-
-    def handle_data(self, data):
-        lines = data.split('\n')
-        for line in lines:
-            if line.startswith('%') == self.show_notes:
-                self.lines.append(line)
-        self.text_field.set_text('\n'.join(self.lines))
+    def render(self, slide_contents):
+        markup = list()
+        for kind, segments in slide_contents:
+            if (kind == 'note') != self.show_notes:
+                continue
+            if markup:
+                markup.append('\n')
+            for attr, text in segments:
+                markup.append(text if attr is None else (attr, text))
+        if not markup:
+            return ''
+        return markup
@@ -0,0 +1,135 @@
+# Copyright (c) 2017, Samantha Marshall (http://pewpewthespells.com)
+# All rights reserved.
+#
+# https://github.com/samdmarshall/sli
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation and/or
+# other materials provided with the distribution.
+#
+# 3. Neither the name of Samantha Marshall nor the names of its contributors may
+# be used to endorse or promote products derived from this software without
+# specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
+# OF THE POSSIBILITY OF SUCH DAMAGE.
+import re
+import bisect
+
+WORD = re.compile(r'\w+')
+SHORT_PREFIX = 2
+
+def tokenize(text):
+    return WORD.findall(text.casefold())
+
+def slide_numbers(bitmap):
+    if bitmap.bit_count() * 64 > bitmap.bit_length():
+        return [index for index, bit in enumerate(bin(bitmap)[:1:-1]) if bit == '1']
+    numbers = list()
+    while bitmap:
+        lowest = bitmap & -bitmap
+        numbers.append(lowest.bit_length() - 1)
+        bitmap ^= lowest
+    return numbers
+
+def first_slide(bitmap, index=0):
+    # lowest set bit at or after index, wrapping around to the start of the deck
+    following = bitmap >> index
+    if following:
+        return index + (following & -following).bit_length() - 1
+    if bitmap:
+        return (bitmap & -bitmap).bit_length() - 1
+    return None
+
+def last_slide(bitmap, index):
+    # highest set bit before index, wrapping around to the end of the deck
+    preceding = bitmap & ((1 << index) - 1)
+    return (preceding or bitmap).bit_length() - 1 if bitmap else None
+
+class SlideIndex(object):
+    # each word maps to a bitmap of the slides containing it, stored in a python int, so that
+    # multi-word queries are a single `&` per word regardless of how common the words are
+    def __init__(self, bitmaps):
+        self.bitmaps = bitmaps
+        self.words = sorted(bitmaps)
+        self.__prefixes = dict()
+
+    @staticmethod
+    def build(page_texts):
+        bitmaps = dict()
+        for index, page_text in enumerate(page_texts):
+            bit = 1 << index
+            for word in set(tokenize(page_text)):
+                bitmaps[word] = bitmaps.get(word, 0) | bit
+        return SlideIndex(bitmaps)
+
+    @staticmethod
+    def load(entry):
+        bitmaps = dict()
+        for word, value in entry.items():
+            if isinstance(value, str):
+                bitmaps[word] = int(value, 16)
+            else:
+                bitmaps[word] = sum(1 << index for index in value)
+        return SlideIndex(bitmaps)
+
+    def dump(self):
+        # rare words are stored as slide numbers, a hex bitmap would be mostly leading zeros
+        entry = dict()
+        for word, bitmap in self.bitmaps.items():
+            if bitmap.bit_count() * 8 < bitmap.bit_length() // 4:
+                entry[word] = slide_numbers(bitmap)
+            else:
+                entry[word] = '%x' % bitmap
+        return entry
+
+    def prefixed(self, prefix):
+        # the last word of a query is still being typed so it matches every word it starts, short
+        # prefixes expand to most of the vocabulary and are memoized as they are re-queried often
+        if len(prefix) > SHORT_PREFIX:
+            return self.__expand(prefix)
+        if prefix not in self.__prefixes:
+            self.__prefixes[prefix] = self.__expand(prefix)
+        return self.__prefixes[prefix]
+
+    def __expand(self, prefix):
+        start = bisect.bisect_left(self.words, prefix)
+        end = bisect.bisect_left(self.words, prefix + '\U0010ffff', start)
+        bitmap = 0
+        for word in self.words[start:end]:
+            bitmap |= self.bitmaps[word]
+        return bitmap
+
+    def search(self, query):
+        words = tokenize(query)
+        if not words:
+            return 0
+        if query[-1:].isspace():
+            bitmap = self.bitmaps.get(words[-1], 0)
+        else:
+            bitmap = self.prefixed(words[-1])
+        for word in words[:-1]:
+            bitmap &= self.bitmaps.get(word, 0)
+        return bitmap
+
+    def next_match(self, query, index):
+        bitmap = self.search(query)
+        return first_slide(bitmap, index), bitmap.bit_count()
+
+    def previous_match(self, query, index):
+        bitmap = self.search(query)
+        return last_slide(bitmap, index), bitmap.bit_count()
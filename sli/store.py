@@ -0,0 +1,169 @@
+# Copyright (c) 2017, Samantha Marshall (http://pewpewthespells.com)
+# All rights reserved.
+#
+# https://github.com/samdmarshall/sli
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation and/or
+# other materials provided with the distribution.
+#
+# 3. Neither the name of Samantha Marshall nor the names of its contributors may
+# be used to endorse or promote products derived from this software without
+# specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
+# OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import zlib
+import array
+import base64
+from .bundle        import encode_lines, decode_lines
+
+DIGEST_SIZE = 20
+
+def slide_position(index, count):
+    if index < 0:
+        index += count
+    if not 0 <= index < count:
+        raise IndexError('slide index out of range')
+    return index
+
+def pack_array(values):
+    return base64.b64encode(values.tobytes()).decode('ascii')
+
+def unpack_array(typecode, text):
+    values = array.array(typecode)
+    values.frombytes(base64.b64decode(text))
+    return values
+
+def encode_slide(contents, compress=False):
+    # a slide is stored as its body lines followed by its notes lines, the same way bundles store
+    # them, so keeping the length of the body is enough to decode either section on its own
+    body = encode_lines([line for line in contents if line[0] != 'note'], 'body')
+    notes = encode_lines([line for line in contents if line[0] == 'note'], 'note')
+    data = body + notes
+    if compress:
+        data = zlib.compress(data)
+    return data, len(body)
+
+class SlideBounds(object):
+    # source offsets of every slide in one flat array, instead of a tuple and two ints per slide
+    def __init__(self, bounds=()):
+        self.offsets = array.array('Q')
+        for start, end in bounds:
+            self.append((start, end))
+
+    def __len__(self):
+        return len(self.offsets) // 2
+
+    def __getitem__(self, index):
+        index = slide_position(index, len(self))
+        return (self.offsets[2 * index], self.offsets[2 * index + 1])
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def append(self, bound):
+        self.offsets.extend(bound)
+
+    def dump(self):
+        return pack_array(self.offsets)
+
+    @classmethod
+    def load(cls, entry):
+        bounds = cls()
+        bounds.offsets = unpack_array('Q', entry)
+        return bounds
+
+class SlideHashes(object):
+    # the sha1 of every slide source back to back in one buffer
+    def __init__(self, hashes=()):
+        self.digests = bytearray()
+        for digest in hashes:
+            self.append(digest)
+
+    def __len__(self):
+        return len(self.digests) // DIGEST_SIZE
+
+    def __getitem__(self, index):
+        index = slide_position(index, len(self))
+        return bytes(self.digests[index * DIGEST_SIZE:(index + 1) * DIGEST_SIZE])
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def append(self, digest):
+        self.digests += digest
+
+class CompiledSlides(object):
+    # every compiled slide encoded back to back in one buffer, decoded again on access. the
+    # renderer caches what it draws, so each slide is only decoded when it is first shown
+    def __init__(self, slides=(), compress=False):
+        self.compress = compress
+        self.content = bytearray()
+        self.offsets = array.array('Q', [0])
+        self.body_lengths = array.array('I')
+        for contents in slides:
+            self.append(contents)
+
+    def __len__(self):
+        return len(self.body_lengths)
+
+    def __getitem__(self, index):
+        data, body_length = self.encoded(index)
+        return decode_lines(data[:body_length], 'body') + decode_lines(data[body_length:], 'note')
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def record(self, index):
+        index = slide_position(index, len(self))
+        data = bytes(self.content[self.offsets[index]:self.offsets[index + 1]])
+        return data, self.body_lengths[index]
+
+    def encoded(self, index):
+        data, body_length = self.record(index)
+        if self.compress:
+            data = zlib.decompress(data)
+        return data, body_length
+
+    def append(self, contents):
+        self.append_record(*encode_slide(contents, self.compress))
+
+    def append_record(self, data, body_length):
+        self.content += data
+        self.offsets.append(len(self.content))
+        self.body_lengths.append(body_length)
+
+    def dump(self):
+        return {
+            'compressed': self.compress,
+            'content': base64.b64encode(self.content).decode('ascii'),
+            'offsets': pack_array(self.offsets),
+            'body_lengths': pack_array(self.body_lengths),
+        }
+
+    @classmethod
+    def load(cls, entry):
+        slides = cls(compress=entry['compressed'])
+        slides.content = bytearray(base64.b64decode(entry['content']))
+        slides.offsets = unpack_array('Q', entry['offsets'])
+        slides.body_lengths = unpack_array('I', entry['body_lengths'])
+        return slides
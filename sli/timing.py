@@ -0,0 +1,137 @@
+# Copyright (c) 2017, Samantha Marshall (http://pewpewthespells.com)
+# All rights reserved.
+#
+# https://github.com/samdmarshall/sli
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation and/or
+# other materials provided with the distribution.
+#
+# 3. Neither the name of Samantha Marshall nor the names of its contributors may
+# be used to endorse or promote products derived from this software without
+# specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
+# OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import time
+import json
+import atexit
+import threading
+import contextlib
+
+STAT_LABELS = [
+    ('deck.load', 'deck load'),
+    ('slide.compile', 'slide compile'),
+    ('slide.render', 'slide render'),
+    ('frame.draw', 'frame draw'),
+    ('ipc.round_trip', 'ipc round trip'),
+    ('ipc.latency', 'ipc latency'),
+]
+
+COUNTER_LABELS = [
+    ('frame.bytes', 'frame bytes'),
+]
+
+class Profiler(object):
+    _lock = threading.Lock()
+    _totals = dict()
+    _trace = list()
+    _profile = None
+    _output_path = None
+    _origin = time.perf_counter()
+
+    @staticmethod
+    def enable(output_path):
+        import cProfile
+        Profiler._output_path = output_path
+        Profiler._profile = cProfile.Profile()
+        Profiler._profile.enable()
+        atexit.register(Profiler.dump)
+
+    @staticmethod
+    def record(name, duration):
+        with Profiler._lock:
+            count, total, _, longest = Profiler._totals.get(name, (0, 0.0, 0.0, 0.0))
+            Profiler._totals[name] = (count + 1, total + duration, duration, max(longest, duration))
+            # the totals feed the stats overlay, the full trace is only kept when profiling
+            if Profiler._profile is not None:
+                finished = time.perf_counter() - Profiler._origin
+                Profiler._trace.append({
+                    'name': name,
+                    'thread': threading.current_thread().name,
+                    'start': finished - duration,
+                    'duration': duration,
+                })
+
+    @staticmethod
+    def count(name, value):
+        with Profiler._lock:
+            count, total, _, largest = Profiler._totals.get(name, (0, 0, 0, 0))
+            Profiler._totals[name] = (count + 1, total + value, value, max(largest, value))
+            if Profiler._profile is not None:
+                Profiler._trace.append({
+                    'name': name,
+                    'thread': threading.current_thread().name,
+                    'start': time.perf_counter() - Profiler._origin,
+                    'value': value,
+                })
+
+    @staticmethod
+    @contextlib.contextmanager
+    def timed(name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            Profiler.record(name, time.perf_counter() - start)
+
+    @staticmethod
+    def summary():
+        lines = list()
+        with Profiler._lock:
+            for name, label in STAT_LABELS:
+                if name not in Profiler._totals:
+                    lines.append('%-15s -' % label)
+                    continue
+                count, total, last, longest = Profiler._totals[name]
+                lines.append('%-15s %8.2f ms  avg %7.2f  max %7.2f  n=%d' % (
+                    label, last * 1000.0, total / count * 1000.0, longest * 1000.0, count))
+            for name, label in COUNTER_LABELS:
+                if name not in Profiler._totals:
+                    lines.append('%-15s -' % label)
+                    continue
+                count, total, last, largest = Profiler._totals[name]
+                lines.append('%-15s %8d B   avg %7d  max %7d  n=%d' % (
+                    label, last, total // count, largest, count))
+        return '\n'.join(lines)
+
+    @staticmethod
+    def dump():
+        if Profiler._profile is None:
+            return
+        Profiler._profile.disable()
+        Profiler._profile.dump_stats(Profiler._output_path + '.pstats')
+        with Profiler._lock:
+            trace = {
+                'totals': dict((name, {'count': count, 'total': total, 'max': longest})
+                               for name, (count, total, _, longest) in Profiler._totals.items()),
+                'events': list(Profiler._trace),
+            }
+        with open(Profiler._output_path + '.json', 'w') as fd:
+            json.dump(trace, fd, indent=2)
+        Profiler._profile = None
@@ -31,30 +31,104 @@
 # OF THE POSSIBILITY OF SUCH DAMAGE.
 
 import sys
+import asyncio
 import urwid
 from switch         import Switch
-from .agent         import Client, Server
-from .render        import SlideDisplay
+from .palette       import PALETTE
+from .timing        import Profiler
+
+class MeteredScreen(urwid.display.raw.Screen):
+    # the raw screen already skips rows that match what is on the terminal, this only measures it
+    def __init__(self):
+        super().__init__()
+        self.written = 0
+    def write(self, data):
+        self.written += len(data.encode('utf-8'))
+        super().write(data)
+    def draw_screen(self, size, canvas):
+        self.written = 0
+        super().draw_screen(size, canvas)
+        if self.written:
+            Profiler.count('frame.bytes', self.written)
+
+class TimedMainLoop(urwid.MainLoop):
+    def draw_screen(self):
+        with Profiler.timed('frame.draw'):
+            super().draw_screen()
 
 class BaseDisplay(object):
     def __init__(self, delegate=None):
         self.widget = urwid.Widget()
         self.run_loop = None
+        self.async_loop = asyncio.new_event_loop()
+        self.stats = urwid.Text('')
+        self.showing_stats = False
+        self.handling_input = False
+        self.draw_pending = False
         self.__delegate = delegate
     def update(self):
         if self.__delegate is not None:
             self.__delegate.update()
-    def run(self):
-        def input_handler(keys, raw):
-            with Switch(keys[0]) as case:
-                if case('space'):
-                    self.__delegate.update()
+    def input_handler(self, keys, raw):
+        self.handling_input = True
+        try:
+            self.handle_keys(keys)
+            self.update()
+        finally:
+            self.handling_input = False
+    def handle_keys(self, keys):
+        # the delegate gets first pick of each key so that an open prompt can swallow the rest
+        while keys:
+            keys = self.__delegate.filterInput(keys)
+            if not keys:
+                break
+            key, keys = keys[0], keys[1:]
+            with Switch(key) as case:
                 if case('ctrl q'):
                     self.exit()
-                if keys[0] in self.__delegate.getInput().keys():
-                    self.__delegate.getInput()[keys[0]]()
-            self.update()
-        self.run_loop = urwid.MainLoop(self.widget, input_filter=input_handler)
+                if case('ctrl p'):
+                    self.toggle_stats()
+                if key in self.__delegate.getInput().keys():
+                    self.__delegate.getInput()[key]()
+    def toggle_stats(self):
+        self.showing_stats = not self.showing_stats
+        if self.showing_stats:
+            self.run_loop.widget = urwid.Overlay(urwid.LineBox(self.stats, 'stats'), self.widget,
+                                                 'right', 66, 'top', 'pack')
+            self.refresh_stats()
+        else:
+            self.run_loop.widget = self.widget
+    def refresh_stats(self, *args):
+        if not self.showing_stats:
+            return
+        self.stats.set_text(Profiler.summary())
+        self.run_loop.set_alarm_in(1.0, self.refresh_stats)
+    def screen_size(self):
+        if self.run_loop is None:
+            return (80, 24)
+        return self.run_loop.screen.get_cols_rows()
+    def request_draw(self):
+        # MainLoop draws once an input batch has been handled, and any other updates made before
+        # the event loop comes around again share a single draw
+        if self.handling_input or self.draw_pending:
+            return
+        self.draw_pending = True
+        self.async_loop.call_soon(self.draw)
+    def draw(self):
+        self.draw_pending = False
+        if self.run_loop is None:
+            return
+        if self.showing_stats:
+            self.stats.set_text(Profiler.summary())
+        self.run_loop.draw_screen()
+    def setup(self, screen=None):
+        event_loop = urwid.AsyncioEventLoop(loop=self.async_loop)
+        if screen is None:
+            screen = MeteredScreen()
+        self.run_loop = TimedMainLoop(self.widget, palette=PALETTE, screen=screen,
+                                      input_filter=self.input_handler, event_loop=event_loop)
+    def run(self):
+        self.setup()
         self.run_loop.run()
     def exit(self):
         if self.__delegate is not None:
@@ -67,16 +141,28 @@ class BaseDisplayDelegate(object):
         self.__interior = BaseDisplay(self)
     def setWidget(self, widget):
         self.__interior.widget = widget
+    def setup(self, screen=None):
+        self.__interior.setup(screen)
     def run(self):
         self.__interior.run()
+    def handleInput(self, keys):
+        self.__interior.input_handler(keys, None)
     def update(self):
         pass
     def exit(self):
         pass
     def getInput(self):
         return {}
+    def filterInput(self, keys):
+        return keys
+    def getEventLoop(self):
+        return self.__interior.async_loop
+    def getScreenSize(self):
+        return self.__interior.screen_size()
     def force_redraw(self):
-        self.__interior.run_loop.draw_screen()
+        self.__interior.request_draw()
+    def draw(self):
+        self.__interior.draw()
 
 class SizingDisplay(BaseDisplayDelegate):
     def __init__(self):
@@ -93,54 +179,253 @@ def calculate_starting_slide(input_number, slide_count):
     return slide_start_index
 
 class SlideController(BaseDisplayDelegate):
-    def __init__(self, slide_deck, slide_number, presenter_mode):
+    def __init__(self, slide_deck, slide_number, presenter_mode, address=None):
+        # only a slide display needs these, sizing the terminal stays light without them
+        from .agent     import Client, Server
+        from .render    import SlideDisplay
+        from .overview  import OverviewGrid
+        from .highlight import CodeHighlighter
+        from .images    import ImageRenderer, image_cache
         super().__init__()
-        self.slides = slide_deck.slides
-        self.slide_index = calculate_starting_slide(slide_number, len(self.slides))
+        self.deck = slide_deck
+        self.deck.has_slide(slide_number)
+        self.slide_index = calculate_starting_slide(slide_number, len(self.deck))
         self.started_presentation = False
         self.__text = urwid.Text('')
-        self.setWidget(urwid.Filler(self.__text, 'top'))
+        self.__shown = None
+        self.__status = urwid.Text('', align='right')
+        self.__matches = urwid.Text('')
+        self.__footer = self.__status if presenter_mode else None
+        self.__body = urwid.Filler(self.__text, 'top')
+        self.__frame = urwid.Frame(self.__body, footer=self.__footer)
+        self.setWidget(self.__frame)
+        self.overview = OverviewGrid(self.deck)
+        self.prompt = None
+        self.prompt_origin = None
+        self.searching = False
+        self.search_index = None
         self.renderer = SlideDisplay()
         self.renderer.set_presenter_notes(presenter_mode)
-        self.renderer.set_display_driver(self.__text)
+        self.rendered = dict()
+        self.highlighter = CodeHighlighter()
+        self.images = ImageRenderer(self.deck.base_path,
+                                    disk_cache=image_cache() if self.deck.deck_cache else None)
+        self.rendered_size = None
         if not presenter_mode:
-            self.agent = Server()
+            self.agent = Server(address)
         else:
-            self.agent = Client()
+            self.agent = Client(address)
         self.agent.update_delegate = self
-        self.agent.start()
+        self.agent.start(self.getEventLoop())
     def getInput(self):
         accepted_input = {
             'left':  self.prev_slide,
             'right': self.next_slide,
+            '/':     self.open_search,
+            'g':     self.open_goto,
+            'o':     self.toggle_overview,
         }
+        for digit in '0123456789':
+            accepted_input[digit] = lambda digit=digit: self.open_goto(digit)
         return accepted_input
+    def filterInput(self, keys):
+        if self.prompt is None and self.__frame.body is self.overview:
+            return self.overview_input(keys)
+        if self.prompt is None:
+            return keys
+        for position, key in enumerate(keys):
+            if self.prompt is None:
+                return keys[position:]
+            with Switch(key) as case:
+                if case('esc'):
+                    self.close_prompt(self.prompt_origin)
+                elif case('enter'):
+                    self.close_prompt(self.prompt_target())
+                elif case('down') and self.searching:
+                    self.find_match(1)
+                elif case('up') and self.searching:
+                    self.find_match(-1)
+                elif isinstance(key, str):
+                    self.prompt.keypress((80,), key)
+                    if self.searching:
+                        self.find_match(0)
+        return []
+    def overview_input(self, keys):
+        for position, key in enumerate(keys):
+            with Switch(key) as case:
+                if case('left'):
+                    self.overview.move(columns=-1)
+                elif case('right'):
+                    self.overview.move(columns=1)
+                elif case('up'):
+                    self.overview.move(rows=-1)
+                elif case('down'):
+                    self.overview.move(rows=1)
+                elif case('page up'):
+                    self.overview.page(-1)
+                elif case('page down'):
+                    self.overview.page(1)
+                elif case('home'):
+                    self.overview.select(0)
+                elif case('end'):
+                    self.overview.select(len(self.deck) - 1)
+                elif case('enter'):
+                    self.show_slide(self.overview.selected)
+                    self.toggle_overview()
+                elif case('esc', 'o'):
+                    self.toggle_overview()
+                else:
+                    # the remaining keys, like the search prompt, work the same from the overview
+                    return keys[position:]
+            if self.__frame.body is not self.overview:
+                return keys[position + 1:]
+        return []
+    def toggle_overview(self):
+        if self.__frame.body is self.overview:
+            self.__frame.body = self.__body
+        else:
+            self.overview.select(self.slide_index)
+            self.__frame.body = self.overview
+    def open_prompt(self, prompt, searching):
+        self.prompt = prompt
+        self.searching = searching
+        self.prompt_origin = self.slide_index
+        self.__matches.set_text('')
+        self.__frame.footer = urwid.Columns([self.prompt, ('pack', self.__matches)])
+        self.__frame.focus_position = 'footer'
+    def prompt_target(self):
+        if self.searching or self.prompt.value() is None:
+            return self.slide_index
+        self.deck.has_slide(self.prompt.value())
+        return calculate_starting_slide(self.prompt.value(), len(self.deck))
+    def close_prompt(self, index):
+        self.prompt = None
+        self.searching = False
+        self.__frame.footer = self.__footer
+        self.__frame.focus_position = 'body'
+        self.show_slide(index)
+    def open_search(self):
+        self.open_prompt(urwid.Edit('/'), True)
+        if self.search_index is None:
+            # the first search of an uncached deck has to build the index, so keep typing responsive
+            indexing = self.getEventLoop().run_in_executor(None, self.deck.search_index)
+            indexing.add_done_callback(self.index_ready)
+    def index_ready(self, indexing):
+        self.search_index = indexing.result()
+        if self.searching:
+            self.find_match(0)
+            self.force_redraw()
+    def open_goto(self, digits=''):
+        self.open_prompt(urwid.IntEdit('slide: ', digits), False)
+    def find_match(self, direction):
+        query = self.prompt.edit_text
+        if self.search_index is None:
+            self.__matches.set_text('indexing')
+            return
+        if direction < 0:
+            index, count = self.search_index.previous_match(query, self.slide_index)
+        elif direction > 0:
+            index, count = self.search_index.next_match(query, self.slide_index + 1)
+        else:
+            index, count = self.search_index.next_match(query, self.prompt_origin)
+        self.__matches.set_text(' %d found' % count if query.strip() else '')
+        self.show_slide(self.prompt_origin if index is None else index)
+    def show_slide(self, index):
+        self.overview.select(index)
+        if index == self.slide_index:
+            return
+        self.slide_index = index
+        self.agent.send_data({'slide':self.slide_index}, 'slide')
     def next_slide(self):
-        should_advance = self.slide_index + 1 < len(self.slides)
+        should_advance = self.deck.has_slide(self.slide_index + 1)
         if should_advance:
             self.slide_index += 1
-            self.agent.send_data({'slide':self.slide_index})
+            self.agent.send_data({'slide':self.slide_index}, 'slide')
         return should_advance
     def prev_slide(self):
         should_backtrack = self.slide_index > 0
         if should_backtrack:
             self.slide_index -= 1
-            self.agent.send_data({'slide':self.slide_index})
+            self.agent.send_data({'slide':self.slide_index}, 'slide')
         return should_backtrack
+    def reload_deck(self):
+        changed = self.deck.reload()
+        if changed:
+            self.getEventLoop().call_soon_threadsafe(self.apply_changes, changed, True)
+    def apply_changes(self, changed, notify_agent=False):
+        if notify_agent:
+            self.agent.send_data({'changed': changed})
+        self.invalidate(changed)
+        self.search_index = None
+        self.slide_index = calculate_starting_slide(self.slide_index, len(self.deck))
+        self.update()
     def process_update(self, data):
+        if 'changed' in data.keys():
+            reloading = self.getEventLoop().run_in_executor(None, self.deck.reload, data['changed'])
+            reloading.add_done_callback(lambda _: self.apply_changes(data['changed']))
         if 'slide' in data.keys():
-            self.slide_index = data['slide']
+            # the other side may have a longer deck, its position is kept within this one
+            self.deck.has_slide(data['slide'])
+            self.slide_index = calculate_starting_slide(data['slide'], len(self.deck))
+        if data.get('deck') not in (None, self.deck.deck_hash) and self.deck.deck_hash is not None:
+            self.__status.set_text('This presentation file differs from the presenter\'s copy')
         self.update()
+    def current_state(self):
+        return {'slide': self.slide_index, 'deck': self.deck.deck_hash}
+    def process_latency(self, round_trip, clock_offset):
+        self.__status.set_text('sync %.1f ms, clock offset %+.1f ms' % (round_trip * 1000.0,
+                                                                       clock_offset * 1000.0))
+        self.force_redraw()
+    def invalidate(self, changed):
+        changed = set(changed)
+        for key in list(self.rendered.keys()):
+            if key[0] in changed:
+                del self.rendered[key]
+    def rendered_slide(self, index):
+        columns, rows = self.getScreenSize()
+        if self.rendered_size != (columns, rows):
+            # images are drawn to fit the terminal, so a resize needs them drawn again
+            self.rendered_size = (columns, rows)
+            self.rendered.clear()
+        key = (index, self.renderer.show_notes)
+        if key not in self.rendered:
+            slide_contents = self.deck[index]
+            pending = None
+            converting = False
+            if not self.renderer.show_notes:
+                loop = self.getEventLoop()
+                redraw = lambda: loop.call_soon_threadsafe(self.highlighted, index)
+                slide_contents, pending = self.highlighter.highlight(slide_contents)
+                slide_contents, converting = self.images.render(slide_contents, columns,
+                                                                max(4, rows // 2), redraw)
+            with Profiler.timed('slide.render'):
+                markup = self.renderer.render(slide_contents)
+            if pending:
+                # the slide is shown plain until the worker has tokenized its code blocks
+                self.highlighter.submit(pending, redraw)
+            if pending or converting:
+                return markup
+            self.rendered[key] = markup
+        return self.rendered[key]
+    def highlighted(self, index):
+        if index == self.slide_index:
+            self.update()
     def update(self):
         if self.__text is None:
             return
-        slide_contents = self.slides[self.slide_index]
-        self.renderer.reset_lines()
-        self.renderer.feed(slide_contents)
-        self.force_redraw()
+        markup = self.rendered_slide(self.slide_index)
+        # leaving the text alone when the slide has not changed keeps urwid's cached canvas, which
+        # the screen then recognises as already drawn
+        if markup is not self.__shown:
+            self.__shown = markup
+            self.__text.set_text(markup)
+            self.force_redraw()
+        self.deck.prefetch(self.slide_index)
+        if not self.renderer.show_notes:
+            self.highlighter.prefetch(self.deck, self.slide_index)
 class PresentationDisplay(SlideController):
-    def __init__(self, slide_deck, slide_number, presenter_mode=False):
-        super().__init__(slide_deck, slide_number, presenter_mode)
+    def __init__(self, slide_deck, slide_number, presenter_mode=False, address=None):
+        super().__init__(slide_deck, slide_number, presenter_mode, address)
 class SpeakerNotesDisplay(SlideController):
-    def __init__(self, slide_deck, slide_number, presenter_mode=True):
-        super().__init__(slide_deck, slide_number, presenter_mode)
+    def __init__(self, slide_deck, slide_number, presenter_mode=True, address=None):
+        super().__init__(slide_deck, slide_number, presenter_mode, address)
@@ -0,0 +1,110 @@
+# Copyright (c) 2017, Samantha Marshall (http://pewpewthespells.com)
+# All rights reserved.
+#
+# https://github.com/samdmarshall/sli
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation and/or
+# other materials provided with the distribution.
+#
+# 3. Neither the name of Samantha Marshall nor the names of its contributors may
+# be used to endorse or promote products derived from this software without
+# specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
+# OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import os
+import time
+import ctypes
+import ctypes.util
+import struct
+import threading
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+EVENT_HEADER = struct.Struct('iIII')
+
+def load_inotify():
+    library_path = ctypes.util.find_library('c')
+    try:
+        libc = ctypes.CDLL(library_path, use_errno=True)
+        libc.inotify_init
+        libc.inotify_add_watch
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+def file_signature(file_path):
+    try:
+        info = os.stat(file_path)
+    except OSError:
+        return None
+    return (info.st_ino, info.st_size, info.st_mtime_ns)
+
+class FileWatcher(object):
+    def __init__(self, file_path, callback, poll_interval=0.5, settle_delay=0.1):
+        self.file_path = os.path.abspath(file_path)
+        self.callback = callback
+        self.poll_interval = poll_interval
+        self.settle_delay = settle_delay
+        self.signature = file_signature(self.file_path)
+
+    def start(self):
+        threading.Thread(target=self.watch, daemon=True).start()
+
+    def watch(self):
+        libc = load_inotify()
+        if libc is not None:
+            inotify_fd = libc.inotify_init()
+            # editors often save by writing a new file and renaming it, so watch the directory
+            directory = os.fsencode(os.path.dirname(self.file_path))
+            if inotify_fd >= 0 and libc.inotify_add_watch(inotify_fd, directory, WATCH_MASK) >= 0:
+                self.watch_inotify(inotify_fd)
+                return
+        self.watch_stat()
+
+    def watch_inotify(self, inotify_fd):
+        file_name = os.fsencode(os.path.basename(self.file_path))
+        while True:
+            events = os.read(inotify_fd, 4096)
+            offset = 0
+            touched = False
+            while offset < len(events):
+                _, _, _, name_length = EVENT_HEADER.unpack_from(events, offset)
+                offset += EVENT_HEADER.size
+                name = events[offset:offset + name_length].rstrip(b'\0')
+                offset += name_length
+                touched = touched or name == file_name
+            if touched:
+                self.check()
+
+    def watch_stat(self):
+        while True:
+            time.sleep(self.poll_interval)
+            self.check()
+
+    def check(self):
+        # writes tend to arrive as a burst of events, give them a moment to finish
+        time.sleep(self.settle_delay)
+        signature = file_signature(self.file_path)
+        if signature is not None and signature != self.signature:
+            self.signature = signature
+            self.callback()